@@ -2,30 +2,37 @@
 ICAO codes will be default respected, with fallback to FAA LID
 """
 
+import asyncio
 import json 
 import os
-import httpx
+import sys
+import threading
+from array import array
+from collections import OrderedDict
 from config import config
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import re
 from math import radians, sin, cos
 from typing_extensions import Literal
 import time
 
-from utils import coalesce_int_from_float, coalesce_float, coalesce
+from utils import coalesce
 from metar_taf_parser.model.model import Wind, Metar
-from metar_taf_parser.model.enum import CloudQuantity
-from aviation_weather import fetch_latest_metar
-
-# Formatted as ceiling, (OR) viz, rules
-FLIGHT_RULES_REQUIREMENTS = [
-    (500, 1, "LIFR"),
-    (1000, 3, "IFR"),
-    (3000, 5, "MVFR"),
-    (100_000, 100, "VFR"),
-]
-
-@dataclass
+from metar_fields import compute_cloud_ceiling, parse_visibility, FLIGHT_RULES_REQUIREMENTS
+import upstream
+import airport_store
+from upstream import UpstreamError
+from aviation_weather import fetch_latest_metar, fetch_latest_taf, fetch_latest_metars, fetch_latest_tafs, \
+    fetch_latest_metar_async, fetch_latest_taf_async
+
+# Callbacks called with the airport whenever a new METAR observation is picked up
+_NEW_METAR_LISTENERS = []
+
+def add_new_metar_listener(fn):
+    """Register fn(airport) to be called when an airport picks up a new METAR report"""
+    _NEW_METAR_LISTENERS.append(fn)
+
+@dataclass(slots=True)
 class Runway:
     length_ft: int
     width_ft: int
@@ -41,21 +48,35 @@ class Runway:
     he_heading_degT: int
     he_displaced_threshold_ft: int
 
-    _dedupped_ident = None
+    # Per-instance cache of the ident without L/R/C
+    _dedupped_ident: str = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Surfaces repeat across tens of thousands of runways, share one string per surface
+        if self.surface is not None:
+            self.surface = sys.intern(self.surface)
+
     def get_dedupped_ident(self):
         if self._dedupped_ident is None:
             self._dedupped_ident = re.sub(r"(L|R|C)", "", self.le_ident)
         return self._dedupped_ident
     dedupped_ident = property(get_dedupped_ident)
 
-@dataclass
+@dataclass(slots=True)
 class Frequency:
     airport_ident: str
     type: str
     description: str
     frequency_mhz: str
 
+    def __post_init__(self):
+        if self.type is not None:
+            self.type = sys.intern(self.type)
+
 class RunwayWindInfo:
+    __slots__ = ("runway", "wind", "favorable_dir", "is_preferred_rw_info", "variation", 
+                 "min_headwind", "max_headwind", "min_crosswind", "max_crosswind")
+
     runway: Runway
     wind: Wind
 
@@ -73,12 +94,10 @@ class RunwayWindInfo:
     max_crosswind: float
 
     def __init__(self, runway: Runway, wind: Wind, is_preferred_rw_info: Literal["le", "he", "no", "unk"]="unk", crosswind_map=None):
-        if crosswind_map:
-            raise ValueError("crosswind_map is not yet supported!")
         self.runway = runway
         self.wind = wind
         self.is_preferred_rw_info = is_preferred_rw_info
-
+        self.variation = False
 
         if wind.direction == "VRB":
             self.variation = True
@@ -88,6 +107,8 @@ class RunwayWindInfo:
             self.max_headwind = coalesce(self.wind.gust, self.wind.speed)
             self.max_crosswind = coalesce(self.wind.gust, self.wind.speed)
             self.favorable_dir = "calm"
+        elif crosswind_map is not None and crosswind_map.supports(wind):
+            self._set_from_crosswind_map(crosswind_map)
         else:
             # Construct all possible wind directions & strengths
             if wind.gust is None and wind.min_variation is None:
@@ -129,22 +150,90 @@ class RunwayWindInfo:
             self.min_headwind = min([w[1] for w in computed_winds if w[2] == self.favorable_dir])
             self.max_headwind = max([w[1] for w in computed_winds if w[2] == self.favorable_dir])
 
+    def _set_from_crosswind_map(self, crosswind_map):
+        """Same results as the full computation, for a single direction (gust or not) with components from the map"""
+        wind = self.wind
+        self.variation = wind.gust is not None
+        strengths = (wind.speed,) if wind.gust is None else (wind.speed, wind.gust)
+        cross_le, head_le, cross_he, head_he = crosswind_map.components(self.runway, wind.degrees)
+        # Headwinds are linear in strength, so the favorable end is the same for all strengths (le on ties)
+        strength = max(strengths)
+        if strength * head_le >= strength * head_he:
+            self.favorable_dir, cross, head = "le", cross_le, head_le
+        else:
+            self.favorable_dir, cross, head = "he", cross_he, head_he
+        crosswinds = [s * cross for s in strengths]
+        headwinds = [s * head for s in strengths]
+        self.min_crosswind, self.max_crosswind = min(crosswinds), max(crosswinds)
+        self.min_headwind, self.max_headwind = min(headwinds), max(headwinds)
+
     def _compute_wind_info(self, dir, strength, runway_end):
         """Returns crosswind, headwind"""
         offset_deg = (self.runway.le_heading_degT if runway_end == "le" else self.runway.he_heading_degT) - dir
         offset = radians(offset_deg)
         return strength * sin(offset), strength * cos(offset)
 
-@dataclass
+class CrosswindMap:
+    """
+    Per airport table of unit crosswind & headwind components for each runway end by integer wind direction (0-360), 
+    plus the runway order by favorable headwind for each direction. 
+    Components are linear in wind strength, so speed & gust don't need their own table dimensions. 
+    Directions are filled in lazily as they're first seen, METARs report to the nearest 10 degrees so there are at most 37. 
+    Winds with variation cover several directions & fall back to the full computation. 
+    """
+    __slots__ = ("runways", "_runway_index", "_by_degrees")
+
+    def __init__(self, runways: list[Runway]):
+        self.runways = runways
+        self._runway_index = {id(rw): i for i, rw in enumerate(runways)}
+        # Degrees -> (flat components, 4 per runway, runway order)
+        self._by_degrees = dict()
+
+    def _entry(self, d: int):
+        entry = self._by_degrees.get(d)
+        if entry is None:
+            # Computed exactly as RunwayWindInfo._compute_wind_info does (as doubles), so results are identical
+            components = array("d")
+            for rw in self.runways:
+                components.extend((sin(radians(rw.le_heading_degT - d)), cos(radians(rw.le_heading_degT - d)), 
+                                   sin(radians(rw.he_heading_degT - d)), cos(radians(rw.he_heading_degT - d))))
+            # Max headwind is max(head_le, head_he) * strength, so for any strength > 0 runways sort the same way. 
+            # Rounded so runways with equal headwinds (up to float error) keep their original order
+            order = array("H", sorted(range(len(self.runways)), key=lambda i: round(max(components[4 * i + 1], components[4 * i + 3]), 9), reverse=True))
+            # Concurrent fills compute the same entry, last one wins
+            entry = self._by_degrees[d] = (components, order)
+        return entry
+
+    def supports(self, wind: Wind):
+        return wind.min_variation is None and isinstance(wind.degrees, int) and 0 <= wind.degrees <= 360 and wind.speed is not None
+
+    def components(self, runway: Runway, degrees: int):
+        """Unit (crosswind le, headwind le, crosswind he, headwind he)"""
+        i = self._runway_index[id(runway)]
+        return self._entry(degrees)[0][4 * i:4 * i + 4]
+
+    def runway_order(self, wind: Wind):
+        """Runways sorted by max headwind, favorable first"""
+        if coalesce(wind.gust, wind.speed) == 0:
+            # Calm, every headwind is 0 so the sort keeps the original order
+            return self.runways
+        return [self.runways[i] for i in self._entry(wind.degrees)[1]]
+
 class Airport:
     """
     Airport info & helper functions constructed from raw data. 
     Includes METAR info & additional info (cloud ceiling, flight category, etc). 
     """
+    __slots__ = ("ident", "icao_code", "iata_code", "local_code", "lat", "long", "elevation_ft", "iso_country", 
+                 "runways", "frequencies", "_unique_runways", "_crosswind_map", "background_refresh", 
+                 "_last_metar_fetch_time", "_last_metar_update_time", "_metar", "_cloud_ceiling", "_runway_wind_info", 
+                 "_flight_category", "_vx_flight_category", "_ceiling_flight_category", "_last_taf_fetch_time", "_taf", 
+                 "_metar_lock")
+
     def __init__(self, ident: str, icao_code: str, iata_code: str, local_code: str, 
                        lat: float, long: float, elevation_ft: int, 
                        iso_country: str, runways: list[Runway], frequencies: list,
-                       fast_compute=False):
+                       fast_compute=False, metar: Metar=None, taf: str=None):
         # Airport info
         self.ident = ident
         self.icao_code = icao_code
@@ -161,43 +250,35 @@ class Airport:
         # Cached unique runways
         self._unique_runways = None
 
-        # Whether fast compute mode is enabled
-        # TODO finish this code out -- 
-        #  create df of weather conditions
-        #  generate monthly averages by hour to store for each year
-        #  then plot that shit (ok seperate)
-        if fast_compute:
-            self._crosswind_map = None 
-
-            rw_info_full = []
-            for rw in self.runways:
-                for i in ["le", "he"]:
-                    rw_info_full.append({
-                        "length_ft": rw.length_ft,
-                        "width_ft": rw.width_ft,
-                        "lighted": rw.lighted,
-                        "closed": rw.closed,
-                        "ident": rw.le_ident if i == "le" else rw.he_ident,
-                        "heading_true": rw[f"{i}_heading_true"],
-                        "displaced_threshold_ft": rw[f"{i}_displaced_threshold_ft"],
-                        "est_lda_ft": rw["est_lda_ft"],
-                        "surface": rw["surface"]
-                    })
-            rw_df = pd.DataFrame(rw_info_full)
-
+        # Precomputed wind components for every wind direction, turns runway wind info into a table lookup
+        self._crosswind_map = CrosswindMap(self.unique_runways) if fast_compute else None
 
-        else:
-            self._crosswind_map = None
+        # When set, a background refresher keeps the METAR warm & requests serve the cached METAR even once expired
+        self.background_refresh = False
 
-        # Cached METAR info
+        # Cached METAR info, derived info is updated together under the lock so snapshots are consistent
+        self._metar_lock = threading.RLock()
         self._last_metar_fetch_time = None
+        self._last_metar_update_time = None
         self._metar = None
         self._cloud_ceiling = None
         self._runway_wind_info = None
         self._flight_category = "UNK"
         self._vx_flight_category = "UNK"
         self._ceiling_flight_category = "UNK"
-        self._fetch_current_metar()
+
+        # Cached TAF info
+        self._last_taf_fetch_time = None
+        self._taf = None
+
+        # Use already fetched METAR/TAF if provided (ex. from a concurrent fetch), otherwise fetch now
+        t = time.time()
+        if taf is not None:
+            self._set_taf(taf, t)
+        if metar is not None:
+            self._set_metar(metar, t)
+        else:
+            self._fetch_current_metar()
 
     def get_unique_runways(self):
         """Returns unique runways, excluding L/R/C duplicates"""
@@ -212,11 +293,7 @@ class Airport:
     unique_runways = property(get_unique_runways)
 
     def _compute_cloud_ceiling(self, metar: Metar):
-        ceiling = coalesce(metar.vertical_visibility, 10_000)
-        for c in metar.clouds:
-            if c.quantity in (CloudQuantity.BKN, CloudQuantity.OVC) and c.height <= ceiling:
-                ceiling = c.height
-        return ceiling
+        return compute_cloud_ceiling(metar)
 
     def _compute_rw_wind(self, metar: Metar):
         """
@@ -224,7 +301,13 @@ class Airport:
         """
         rws_wind_info = []
         rws = self.unique_runways
-        rws_wind_info = sorted([RunwayWindInfo(rw, metar.wind) for rw in rws], key=lambda rwi: rwi.max_headwind, reverse=True)
+        if not rws:
+            return rws_wind_info
+        wind = metar.wind
+        if self._crosswind_map is not None and wind.direction != "VRB" and self._crosswind_map.supports(wind):
+            rws_wind_info = [RunwayWindInfo(rw, wind, crosswind_map=self._crosswind_map) for rw in self._crosswind_map.runway_order(wind)]
+        else:
+            rws_wind_info = sorted([RunwayWindInfo(rw, wind) for rw in rws], key=lambda rwi: rwi.max_headwind, reverse=True)
         dir = rws_wind_info[0].favorable_dir
         rws_wind_info[0].is_preferred_rw_info = ("le" if dir == "calm" else dir)
         return rws_wind_info
@@ -246,15 +329,7 @@ class Airport:
         return overall_flight_category, vx_flight_category, ceiling_flight_category
     
     def _parse_visibility(self, s: str):
-        if s.endswith("SM"):
-            s = s[:-2].split(" ")
-            if len(s) == 1:
-                return float(s[0])
-            else:
-                f = s[1].split("/")
-                return float(s[0]) + float(f[0]) / float(f[1])
-        else:
-            return 0
+        return parse_visibility(s)
     
     def _get_cloud_ceiling(self):
         self._fetch_current_metar()
@@ -276,140 +351,423 @@ class Airport:
         self._fetch_current_metar()
         return self._runway_wind_info
     
+    def _metar_cache_expired(self, t, cache_expiration_timeout=60):
+        # A fetch that found no METAR is cached too, so stations without one aren't refetched on every access
+        return (self._last_metar_fetch_time is None) or (t - self._last_metar_fetch_time > cache_expiration_timeout)
+
+    def _set_metar(self, new_metar: Metar, t):
+        """Update the cached METAR fetched at time t, only recomputing if the METAR is a new observation"""
+        self._last_metar_fetch_time = t
+        if new_metar is None:
+            return
+        self._last_metar_update_time = t
+        if self._metar is None or new_metar.day != self._metar.day or new_metar.time != self._metar.time:
+            cloud_ceiling = self._compute_cloud_ceiling(new_metar)
+            runway_wind_info = self._compute_rw_wind(new_metar)
+            flight_categories = self._compute_flight_category(new_metar, cloud_ceiling)
+            with self._metar_lock:
+                self._metar = new_metar
+                self._cloud_ceiling = cloud_ceiling
+                self._runway_wind_info = runway_wind_info
+                self._flight_category, self._vx_flight_category, self._ceiling_flight_category = flight_categories
+            for fn in _NEW_METAR_LISTENERS:
+                fn(self)
+
     def _fetch_current_metar(self, check_cache=True, cache_expiration_timeout=60):
         """Fetch current METAR and cache relevant data with an expiration time in seconds"""
         t = time.time()
-        if (not check_cache) or (self._last_metar_fetch_time is None) or (self._metar is None) or (t - self._last_metar_fetch_time > cache_expiration_timeout):
-            self._last_metar_fetch_time = t
-            new_metar = fetch_latest_metar(coalesce(self.icao_code, self.ident))
-            # Only update & recompute if METAR is a new time
-            if self._metar is None or new_metar.day != self._metar.day or new_metar.time != self._metar.time:
-                self._metar = new_metar
-                if self._metar is not None:
-                    self._cloud_ceiling = self._compute_cloud_ceiling(self._metar)
-                    self._runway_wind_info = self._compute_rw_wind(self._metar)
-                    self._flight_category, self._vx_flight_category, self._ceiling_flight_category = self._compute_flight_category(self._metar, self._cloud_ceiling)
+        if check_cache and self.background_refresh:
+            # Stale while revalidate, the background refresher will update the METAR (or find one)
+            return self._metar
+        if (not check_cache) or self._metar_cache_expired(t, cache_expiration_timeout):
+            self._set_metar(fetch_latest_metar(coalesce(self.icao_code, self.ident)), t)
         return self._metar
+
+    def _get_metar_is_stale(self, cache_expiration_timeout=60):
+        """True if the last successful METAR fetch is older than the expiration time (ex. refresh in flight or failing)"""
+        return self._last_metar_update_time is None or time.time() - self._last_metar_update_time > cache_expiration_timeout
     metar: Metar = property(_fetch_current_metar)
+    metar_is_stale: bool = property(_get_metar_is_stale)
     cloud_ceiling: int = property(_get_cloud_ceiling)
     runway_wind_info: RunwayWindInfo = property(_get_runway_wind_info)
     flight_category: str = property(_get_flight_category)
     visibility_flight_category: str = property(_get_vx_flight_category)
     ceiling_flight_category: str = property(_get_ceiling_flight_category)
-    
+
+    def snapshot(self):
+        """Consistent view of the airport & everything derived from one METAR, ex. to render all panels from"""
+        self._fetch_current_metar()
+        with self._metar_lock:
+            return AirportSnapshot(
+                ident=self.ident,
+                icao_code=self.icao_code,
+                iata_code=self.iata_code,
+                local_code=self.local_code,
+                unique_runways=self.unique_runways,
+                metar=self._metar,
+                metar_is_stale=self.metar_is_stale,
+                cloud_ceiling=self._cloud_ceiling,
+                runway_wind_info=self._runway_wind_info,
+                flight_category=self._flight_category,
+                visibility_flight_category=self._vx_flight_category,
+                ceiling_flight_category=self._ceiling_flight_category
+            )
+
+    def _taf_cache_expired(self, t, cache_expiration_timeout=60):
+        return (self._last_taf_fetch_time is None) or (self._taf is None) or (t - self._last_taf_fetch_time > cache_expiration_timeout)
+
+    def _set_taf(self, new_taf: str, t):
+        self._last_taf_fetch_time = t
+        self._taf = new_taf
+
     def _fetch_current_taf(self, check_cache=True, cache_expiration_timeout=60):
         """Fetch current TAF and cache relevant data with an expiration time in seconds"""
         t = time.time()
-        if (not check_cache) or (self._last_metar_fetch_time is None) or (self._metar is None) or (t - self._last_metar_fetch_time > cache_expiration_timeout):
-            self._taf = "TAF TODO"
+        if check_cache and self.background_refresh and self._taf is not None:
+            return self._taf
+        if (not check_cache) or self._taf_cache_expired(t, cache_expiration_timeout):
+            self._set_taf(fetch_latest_taf(coalesce(self.icao_code, self.ident)), t)
         return self._taf
     taf = property(_fetch_current_taf)
+
+@dataclass(frozen=True, slots=True)
+class AirportSnapshot:
+    """Immutable airport & METAR derived info, with the same attributes the renderers read from an Airport"""
+    ident: str
+    icao_code: str
+    iata_code: str
+    local_code: str
+    unique_runways: list
+    metar: Metar
+    metar_is_stale: bool
+    cloud_ceiling: int
+    runway_wind_info: list
+    flight_category: str
+    visibility_flight_category: str
+    ceiling_flight_category: str
+
+def refresh_airports(airports: list, include_taf: bool=False, check_cache=True, cache_expiration_timeout=60):
+    """Refresh METARs (& optionally TAFs) for many airports using batched requests, only fetching expired caches"""
+    t = time.time()
+    metar_airports = [a for a in airports if (not check_cache) or a._metar_cache_expired(t, cache_expiration_timeout)]
+    if metar_airports:
+        metars = fetch_latest_metars([coalesce(a.icao_code, a.ident) for a in metar_airports])
+        for a in metar_airports:
+            a._set_metar(metars[coalesce(a.icao_code, a.ident).lower()], t)
+
+    if include_taf:
+        taf_airports = [a for a in airports if (not check_cache) or a._taf_cache_expired(t, cache_expiration_timeout)]
+        if taf_airports:
+            tafs = fetch_latest_tafs([coalesce(a.icao_code, a.ident) for a in taf_airports])
+            for a in taf_airports:
+                a._set_taf(tafs[coalesce(a.icao_code, a.ident).lower()], t)
     
 def _prefetch_azos_airport_info(check_cache=True):
-    """Fetches & caches airport info AZOS geojson & returns all airport FAA LIDs / ICAO codes"""
+    """Fetches & caches airport info AZOS geojson into the airport store & returns all airport FAA LIDs / ICAO codes"""
     # Cache check
     fp = config["azos_airport_info_fp"]
     geojson_fp = f"{fp}/AZOS.geojson"
     if (not check_cache) or (not os.path.isfile(geojson_fp)):
-        resp = httpx.get("http://mesonet.agron.iastate.edu/geojson/network/AZOS.geojson", timeout=60)
+        resp = upstream.get("http://mesonet.agron.iastate.edu/geojson/network/AZOS.geojson")
         geojson = resp.json()
         with open(geojson_fp, "w") as f:
             json.dump(geojson, f)
-    with open(geojson_fp) as f:
-        g = json.load(f)
-
-    # Save airports
-    for r in g["features"]:
-        code = r["id"]
-        airport_fp = f"{fp}/{code}.json"
-        if not os.path.isfile(airport_fp):
-            with open(airport_fp, "w") as f:
-                json.dump(r, f)
 
-    return [r["id"] for r in g["features"]]
+    # Only re-import if the geojson changed since the last import
+    mtime = str(os.path.getmtime(geojson_fp))
+    if airport_store.get_meta("azos_geojson_mtime") != mtime:
+        with open(geojson_fp) as f:
+            airport_store.import_azos_geojson(json.load(f))
+        airport_store.set_meta("azos_geojson_mtime", mtime)
 
-with open(os.path.join(config["keys_fp"], config["airportdb_token_fn"]), "r") as f:
-    AIRPORTDB_KEY = f.read()
+    return airport_store.metar_station_ids()
 
-_prefetch_azos_airport_info()
+def _import_legacy_airportdb_json():
+    """One time import of airportdb payloads previously cached as one JSON file per airport"""
+    if airport_store.get_meta("legacy_airportdb_imported"):
+        return
+    json_dir = config["airportdb_airport_info_fp"]
+    for fn in os.listdir(json_dir):
+        if fn.endswith(".json"):
+            with open(os.path.join(json_dir, fn)) as f:
+                airport_store.upsert_airportdb(json.load(f))
+    airport_store.set_meta("legacy_airportdb_imported", "1")
+
+# Module level I/O is deferred until the first lookup (or an explicit warmup) to keep startup fast
+_AIRPORTDB_KEY = None
+# Warmup steps that have succeeded, each one is retried until it does
+_initialized = set()
+_azos_failed_time = None
+_init_lock = threading.Lock()
+
+def _get_airportdb_key():
+    """airportdb.io token, None if there isn't one (ex. running purely from bulk imported data)"""
+    global _AIRPORTDB_KEY
+    fp = os.path.join(config["keys_fp"], config["airportdb_token_fn"])
+    if _AIRPORTDB_KEY is None and os.path.isfile(fp):
+        with open(fp, "r") as f:
+            _AIRPORTDB_KEY = f.read()
+    return _AIRPORTDB_KEY
+
+def _import_ourairports_if_updated():
+    """Bulk import OurAirports CSVs if present & changed since the last import"""
+    if not airport_store.ourairports_available():
+        return
+    mtime = str(os.path.getmtime(os.path.join(config["ourairports_fp"], airport_store.OURAIRPORTS_FILES["airports"])))
+    if airport_store.get_meta("ourairports_mtime") != mtime:
+        airport_store.import_ourairports()
+        airport_store.set_meta("ourairports_mtime", mtime)
+
+def warmup():
+    """
+    Run the one time airport imports & AZOS prefetch, called on first lookup if not called explicitly. 
+    Local imports don't depend on the AZOS download, if it fails lookups are served from the store & it's retried later.
+    """
+    global _azos_failed_time
+    with _init_lock:
+        if "ourairports" not in _initialized:
+            _import_ourairports_if_updated()
+            _initialized.add("ourairports")
+        if "legacy_airportdb" not in _initialized:
+            _import_legacy_airportdb_json()
+            _initialized.add("legacy_airportdb")
+        if "azos" not in _initialized:
+            if _azos_failed_time is not None and time.time() - _azos_failed_time < config["startup"]["azos_retry_s"]:
+                return
+            try:
+                _prefetch_azos_airport_info()
+                _initialized.add("azos")
+            except UpstreamError as e:
+                _azos_failed_time = time.time()
+                print(f"AZOS station list fetch failed, using stored airports: {e}")
+
+def _estimate_size(obj, seen=None):
+    """Rough deep size in bytes of an object graph (attributes, lists, dicts), each object counted once"""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        size += sum(_estimate_size(k, seen) + _estimate_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_estimate_size(v, seen) for v in obj)
+    if hasattr(obj, "__dict__"):
+        size += _estimate_size(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, slot):
+            size += _estimate_size(getattr(obj, slot), seen)
+    return size
+
+class AirportCache:
+    """
+    LRU cache of airports bounded by entry count & estimated memory. 
+    Pinned airports (board & background refreshed stations) are never evicted and don't count towards the bounds. 
+    """
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # Airport & estimated size by ICAO-like code, least recently used first
+        self._entries = OrderedDict()
+        self._pinned = set()
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypasses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Airport for key (or None), counting a hit/miss & marking it recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def peek(self, key):
+        """Airport for key (or None) without touching LRU order or stats"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, airport):
+        with self._lock:
+            self._entries[key] = (airport, _estimate_size(airport))
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def pin(self, key):
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict()
+
+    def resize(self, airport):
+        """Re-estimate an airport's size, ex. after it picks up a new METAR"""
+        with self._lock:
+            for key, (a, _) in self._entries.items():
+                if a is airport:
+                    self._entries[key] = (a, _estimate_size(a))
+            self._evict()
+
+    def _unpinned_bytes(self):
+        return sum(size for key, (_, size) in self._entries.items() if key not in self._pinned)
+
+    def _evict(self):
+        # Oldest first
+        unpinned = [key for key in self._entries.keys() if key not in self._pinned]
+        n_entries, n_bytes = len(unpinned), self._unpinned_bytes()
+        for key in unpinned:
+            if n_entries <= self.max_entries and n_bytes <= self.max_bytes:
+                break
+            _, size = self._entries.pop(key)
+            n_entries -= 1
+            n_bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "pinned": len(self._pinned & self._entries.keys()),
+                "estimated_bytes": sum(size for _, size in self._entries.values()),
+                "unpinned_bytes": self._unpinned_bytes(),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "bypasses": self.bypasses
+            }
 
 # Cache for airport info
-_AIRPORTS = dict()
+AIRPORT_CACHE = AirportCache(config["airport_cache"]["max_entries"], config["airport_cache"]["max_bytes"])
+add_new_metar_listener(AIRPORT_CACHE.resize)
+
+def _fetch_airportdb_record(icao_code, check_cache=True):
+    """Fetch airportdb info into the airport store if not already stored (or bulk imported), returns the store record (or None)"""
+    stored = airport_store.lookup(icao_code, sources=airport_store.FULL_SOURCES)
+    # check_cache=False only bypasses the stored record for a fresh airportdb fetch, without a token the store is all there is
+    if (check_cache and stored is not None) or _get_airportdb_key() is None:
+        return stored
+    url = f"https://airportdb.io/api/v1/airport/{icao_code}"
+    try:
+        resp = upstream.get(url, params={"apiToken": _get_airportdb_key()})
+    except UpstreamError as e:
+        if e.status_code == 404:
+            return stored
+        raise
+    airport_store.upsert_airportdb(resp.json())
+    return airport_store.lookup(icao_code, sources=("airportdb",))
+
+async def _fetch_airportdb_record_async(client, icao_code, check_cache=True):
+    """Async equivalent of _fetch_airportdb_record"""
+    stored = airport_store.lookup(icao_code, sources=airport_store.FULL_SOURCES)
+    # check_cache=False only bypasses the stored record for a fresh airportdb fetch, without a token the store is all there is
+    if (check_cache and stored is not None) or _get_airportdb_key() is None:
+        return stored
+    url = f"https://airportdb.io/api/v1/airport/{icao_code}"
+    try:
+        resp = await upstream.get_async(client, url, params={"apiToken": _get_airportdb_key()})
+    except UpstreamError as e:
+        if e.status_code == 404:
+            return stored
+        raise
+    airport_store.upsert_airportdb(resp.json())
+    return airport_store.lookup(icao_code, sources=("airportdb",))
+
+def _airport_from_record(record, **kwargs):
+    """Construct an airport from an airport store record, kwargs are passed to Airport"""
+    kwargs.setdefault("fast_compute", config["runway_wind"]["fast_compute"])
+    return Airport(
+        ident=record["ident"],
+        icao_code=record["icao_code"],
+        iata_code=record["iata_code"],
+        local_code=record["local_code"],
+        lat=record["lat"],
+        long=record["long"],
+        elevation_ft=record["elevation_ft"],
+        iso_country=record["iso_country"],
+        runways=[Runway(
+            length_ft=r["length_ft"],
+            width_ft=r["width_ft"],
+            surface=r["surface"],
+            lighted=bool(r["lighted"]),
+            closed=bool(r["closed"]),
+            le_ident=r["le_ident"],
+            le_elevation_ft=r["le_elevation_ft"],
+            le_heading_degT=r["le_heading_degT"],
+            le_displaced_threshold_ft=r["le_displaced_threshold_ft"],
+            he_ident=r["he_ident"],
+            he_elevation_ft=r["he_elevation_ft"],
+            he_heading_degT=r["he_heading_degT"],
+            he_displaced_threshold_ft=r["he_displaced_threshold_ft"]
+        ) for r in record["runways"]],
+        frequencies=[Frequency(
+            airport_ident=f["airport_ident"],
+            type=f["type"],
+            description=f["description"],
+            frequency_mhz=f["frequency_mhz"]
+        ) for f in record["frequencies"]],
+        **kwargs
+    )
 
 def _fetch_airportdb_airport_info(icao_code, check_cache=True):
-    json_dir = config["airportdb_airport_info_fp"]
-    json_fp = f"{json_dir}/{icao_code}.json"
-    if (not check_cache) or (not os.path.isfile(json_fp)):
-        url = f"https://airportdb.io/api/v1/airport/{icao_code}?apiToken={AIRPORTDB_KEY}"
-        resp = httpx.get(url, timeout=60)
-        if resp.status_code == 404:
-            return None
-        airport_info = resp.json()
-        with open(json_fp, "w") as f:
-            json.dump(airport_info, f)
-    with open(json_fp) as f:
-        info = json.load(f)
-        return Airport(
-            ident=info["ident"],
-            icao_code=info["icao_code"],
-            iata_code=info["iata_code"],
-            local_code=info["local_code"],
-            lat=coalesce_float(info["latitude_deg"]),
-            long=coalesce_float(info["longitude_deg"]),
-            elevation_ft=info["elevation_ft"],
-            iso_country=info["iso_country"],
-            runways=[Runway(
-                length_ft=coalesce_int_from_float(r["length_ft"]),
-                width_ft=coalesce_int_from_float(r["width_ft"]),
-                surface=r["surface"],
-                lighted=r["lighted"] == "1",
-                closed=r["closed"] == "1",
-                le_ident=r["le_ident"],
-                le_elevation_ft=coalesce_int_from_float(r["le_elevation_ft"]),
-                le_heading_degT=coalesce_int_from_float(r["le_heading_degT"]),
-                le_displaced_threshold_ft=coalesce_int_from_float(r["le_displaced_threshold_ft"]),
-                he_ident=r["he_ident"],
-                he_elevation_ft=coalesce_int_from_float(r["he_elevation_ft"]),
-                he_heading_degT=coalesce_int_from_float(r["he_heading_degT"]),
-                he_displaced_threshold_ft=coalesce_int_from_float(r["he_displaced_threshold_ft"])
-            ) for r in info["runways"]],
-            frequencies=[Frequency(
-                airport_ident=f["airport_ident"],
-                type=f["type"],
-                description=f["description"],
-                frequency_mhz=f["frequency_mhz"]
-            ) for f in info["freqs"]]
-        )
+    record = _fetch_airportdb_record(icao_code, check_cache=check_cache)
+    if record is None:
+        return None
+    return _airport_from_record(record)
 
-def _fetch_azos_airport_info(icao_like_code):
-    ident = icao_to_local(icao_like_code)
-    fp = f"{config['azos_airport_info_fp']}/{ident}.json"
-    if not os.path.isfile(fp):
+def _fetch_azos_airport_info(icao_like_code, **kwargs):
+    """AZOS stations are keyed by FAA LID, with no runway info"""
+    record = airport_store.lookup(coalesce(icao_to_local(icao_like_code), icao_like_code), sources=("azos",))
+    if record is None:
         return None
-    with open(fp) as f:
-        info = json.load(fp)
-    return Airport(
-        ident=icao_like_code,
-        icao_code=icao_like_code if icao_like_code == ident else None,
-        local_code=ident if icao_like_code != ident else ident,
-        lat=coalesce_float(info["geometry"]["coordinates"][0]),
-        long=coalesce_float(info["geometry"]["coordinates"][1]),
-        elevation_ft=int(coalesce_float(info["properties"]["elevation"], default=0)),
-        iso_country=info["properties"]
-    )
+    if record["ident"] != icao_like_code.upper():
+        record["icao_code"] = icao_like_code.upper()
+    return _airport_from_record(record, **kwargs)
 
 def _set_airport_info(icao_like_code, info):
     """Set cache to airport info, return true if successful and info not null"""
     if info is not None:
-        _AIRPORTS[icao_like_code] = info
+        # A bypassing refetch replaces the cached airport, keep it background refreshed if the old one was
+        previous = AIRPORT_CACHE.peek(icao_like_code)
+        if previous is not None and previous is not info:
+            info.background_refresh = previous.background_refresh
+        AIRPORT_CACHE.put(icao_like_code, info)
         return True
     return False
 
+def _get_cached_airport_info(icao_like_code, check_cache=True):
+    if not check_cache:
+        AIRPORT_CACHE.bypasses += 1
+        return None
+    return AIRPORT_CACHE.get(icao_like_code)
+
 def get_airport_info(icao_like_code, check_cache=True):
-    """Get airport info from ICAO code (will auto correct ICAO) using existing cache"""
+    """Get airport info from ICAO code (will auto correct ICAO) using existing cache, check_cache=False refetches & replaces it"""
+    warmup()
     icao_like_code = icao_like_code.upper()
-    if (not check_cache) or icao_like_code in _AIRPORTS.keys():
-        return _AIRPORTS[icao_like_code]
+    info = _get_cached_airport_info(icao_like_code, check_cache=check_cache)
+    if info is not None:
+        return info
     
     # Try airportdb
     info = _fetch_airportdb_airport_info(icao_like_code, check_cache=check_cache)
@@ -429,6 +787,40 @@ def get_airport_info(icao_like_code, check_cache=True):
         return info
     return None
 
+async def get_airport_info_async(icao_like_code, check_cache=True):
+    """
+    Async equivalent of get_airport_info, fetching airportdb info (& the K-prefixed fallback), METAR, & TAF concurrently 
+    so a cold load costs roughly one round trip
+    """
+    warmup()
+    icao_like_code = icao_like_code.upper()
+    info = _get_cached_airport_info(icao_like_code, check_cache=check_cache)
+    if info is not None:
+        return info
+
+    codes = [icao_like_code]
+    icao = try_append_k(icao_like_code)
+    if icao:
+        codes.append(icao.upper())
+
+    async with upstream.new_async_client() as client:
+        results = await asyncio.gather(
+            *[_fetch_airportdb_record_async(client, c, check_cache=check_cache) for c in codes],
+            fetch_latest_metar_async(client, icao_like_code),
+            fetch_latest_taf_async(client, icao_like_code)
+        )
+    *infos, metar, taf = results
+
+    record = next((i for i in infos if i is not None), None)
+    if record is not None:
+        airport = _airport_from_record(record, metar=metar, taf=taf)
+    else:
+        # Fallback to azos - local store only
+        airport = _fetch_azos_airport_info(icao_like_code, metar=metar, taf=taf)
+    if _set_airport_info(icao_like_code, airport):
+        return airport
+    return None
+
 def icao_to_local(icao):
     icao = icao.lower()
     if icao.startswith("k") and len(icao) == 4:
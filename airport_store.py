@@ -0,0 +1,280 @@
+"""
+Single indexed on-disk airport store (SQLite), built from the AZOS geojson & airportdb payloads. 
+Replaces one JSON file per airport, lookups by ICAO, ident, FAA LID, or IATA code are index seeks.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+from config import config
+
+from utils import coalesce, coalesce_float, coalesce_int_from_float
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS airports (
+    ident TEXT NOT NULL,
+    source TEXT NOT NULL,
+    icao_code TEXT,
+    iata_code TEXT,
+    local_code TEXT,
+    name TEXT,
+    lat REAL,
+    long REAL,
+    elevation_ft INTEGER,
+    iso_country TEXT,
+    tzname TEXT,
+    reports_metar INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (ident, source)
+);
+CREATE INDEX IF NOT EXISTS airports_icao ON airports (icao_code);
+CREATE INDEX IF NOT EXISTS airports_local ON airports (local_code);
+CREATE INDEX IF NOT EXISTS airports_iata ON airports (iata_code);
+
+CREATE TABLE IF NOT EXISTS runways (
+    airport_ident TEXT NOT NULL,
+    source TEXT NOT NULL,
+    length_ft INTEGER,
+    width_ft INTEGER,
+    surface TEXT,
+    lighted INTEGER,
+    closed INTEGER,
+    le_ident TEXT,
+    le_elevation_ft INTEGER,
+    le_heading_degT INTEGER,
+    le_displaced_threshold_ft INTEGER,
+    he_ident TEXT,
+    he_elevation_ft INTEGER,
+    he_heading_degT INTEGER,
+    he_displaced_threshold_ft INTEGER
+);
+CREATE INDEX IF NOT EXISTS runways_airport ON runways (airport_ident, source);
+
+CREATE TABLE IF NOT EXISTS frequencies (
+    airport_ident TEXT NOT NULL,
+    source TEXT NOT NULL,
+    type TEXT,
+    description TEXT,
+    frequency_mhz TEXT
+);
+CREATE INDEX IF NOT EXISTS frequencies_airport ON frequencies (airport_ident, source);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+RUNWAY_COLUMNS = [
+    "length_ft", "width_ft", "surface", "lighted", "closed",
+    "le_ident", "le_elevation_ft", "le_heading_degT", "le_displaced_threshold_ft",
+    "he_ident", "he_elevation_ft", "he_heading_degT", "he_displaced_threshold_ft",
+]
+FREQUENCY_COLUMNS = ["type", "description", "frequency_mhz"]
+AIRPORT_COLUMNS = ["ident", "source", "icao_code", "iata_code", "local_code", "name", "lat", "long", 
+                   "elevation_ft", "iso_country", "tzname", "reports_metar"]
+
+# Sources in order of preference when a code matches several records, AZOS records have no runways
+SOURCE_PREFERENCE = ["airportdb", "ourairports", "azos"]
+
+# Sources with full airport info (runways & frequencies)
+FULL_SOURCES = ("airportdb", "ourairports")
+
+# OurAirports CSV file names, see https://ourairports.com/data/
+OURAIRPORTS_FILES = {
+    "airports": "airports.csv",
+    "runways": "runways.csv",
+    "frequencies": "airport-frequencies.csv",
+}
+
+# SQLite connections can't be shared across threads
+_local = threading.local()
+
+def get_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(config["airport_store_fp"])
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+def get_meta(key: str):
+    row = get_connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return None if row is None else row["value"]
+
+def set_meta(key: str, value: str):
+    with get_connection() as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+def _delete_airport(conn, ident: str, source: str):
+    conn.execute("DELETE FROM airports WHERE ident = ? AND source = ?", (ident, source))
+    conn.execute("DELETE FROM runways WHERE airport_ident = ? AND source = ?", (ident, source))
+    conn.execute("DELETE FROM frequencies WHERE airport_ident = ? AND source = ?", (ident, source))
+
+def _insert_airport(conn, airport: dict, runways: list=(), frequencies: list=()):
+    _delete_airport(conn, airport["ident"], airport["source"])
+    conn.execute(f"INSERT INTO airports ({', '.join(AIRPORT_COLUMNS)}) VALUES ({', '.join('?' * len(AIRPORT_COLUMNS))})",
+                 [airport.get(c) for c in AIRPORT_COLUMNS])
+    conn.executemany(f"INSERT INTO runways (airport_ident, source, {', '.join(RUNWAY_COLUMNS)}) VALUES ({', '.join('?' * (len(RUNWAY_COLUMNS) + 2))})",
+                     [[airport["ident"], airport["source"]] + [r.get(c) for c in RUNWAY_COLUMNS] for r in runways])
+    conn.executemany(f"INSERT INTO frequencies (airport_ident, source, {', '.join(FREQUENCY_COLUMNS)}) VALUES ({', '.join('?' * (len(FREQUENCY_COLUMNS) + 2))})",
+                     [[airport["ident"], airport["source"]] + [f.get(c) for c in FREQUENCY_COLUMNS] for f in frequencies])
+
+def _reports_metar(conn, *codes):
+    codes = [c for c in codes if c]
+    if not codes:
+        return 0
+    row = conn.execute(f"SELECT 1 FROM airports WHERE source = 'azos' AND ident IN ({', '.join('?' * len(codes))}) LIMIT 1", codes).fetchone()
+    return int(row is not None)
+
+def import_azos_geojson(geojson: dict):
+    """Import all AZOS (METAR reporting) stations in one transaction"""
+    with get_connection() as conn:
+        conn.execute("DELETE FROM airports WHERE source = 'azos'")
+        conn.executemany(f"INSERT INTO airports ({', '.join(AIRPORT_COLUMNS)}) VALUES ({', '.join('?' * len(AIRPORT_COLUMNS))})", [[
+            f["id"], "azos", None, None, f["id"], f["properties"].get("sname"),
+            # geojson coordinates are [lon, lat]
+            coalesce_float(f["geometry"]["coordinates"][1]), coalesce_float(f["geometry"]["coordinates"][0]),
+            coalesce_int_from_float(f["properties"].get("elevation"), default=0), f["properties"].get("country"),
+            f["properties"].get("tzname"), 1
+        ] for f in geojson["features"]])
+        _update_reports_metar(conn)
+
+def _update_reports_metar(conn):
+    conn.execute("""UPDATE airports SET reports_metar = 1 WHERE source != 'azos' AND (
+                        local_code IN (SELECT ident FROM airports WHERE source = 'azos') OR 
+                        ident IN (SELECT ident FROM airports WHERE source = 'azos'))""")
+
+def _read_csv(fp: str):
+    with open(fp, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+def _none_if_empty(s):
+    return s if s else None
+
+def import_ourairports(dir_fp: str=None):
+    """
+    Bulk import OurAirports airports, runways & frequencies CSVs in one pass & one transaction, so lookups never 
+    need airportdb.io. Returns the number of airports imported.
+    """
+    dir_fp = coalesce(dir_fp, config["ourairports_fp"])
+    fps = {k: os.path.join(dir_fp, fn) for k, fn in OURAIRPORTS_FILES.items()}
+    n_airports = 0
+    with get_connection() as conn:
+        conn.execute("DELETE FROM airports WHERE source = 'ourairports'")
+        conn.execute("DELETE FROM runways WHERE source = 'ourairports'")
+        conn.execute("DELETE FROM frequencies WHERE source = 'ourairports'")
+
+        for a in _read_csv(fps["airports"]):
+            conn.execute(f"INSERT OR REPLACE INTO airports ({', '.join(AIRPORT_COLUMNS)}) VALUES ({', '.join('?' * len(AIRPORT_COLUMNS))})", [
+                a["ident"], "ourairports", _none_if_empty(a.get("icao_code") or a.get("gps_code")), 
+                _none_if_empty(a["iata_code"]), _none_if_empty(a["local_code"]), a["name"],
+                coalesce_float(a["latitude_deg"]), coalesce_float(a["longitude_deg"]), 
+                coalesce_int_from_float(a["elevation_ft"]), a["iso_country"], None, 0
+            ])
+            n_airports += 1
+
+        conn.executemany(f"INSERT INTO runways (airport_ident, source, {', '.join(RUNWAY_COLUMNS)}) VALUES ({', '.join('?' * (len(RUNWAY_COLUMNS) + 2))})", ([
+            r["airport_ident"], "ourairports",
+            coalesce_int_from_float(r["length_ft"]), coalesce_int_from_float(r["width_ft"]), r["surface"],
+            int(r["lighted"] == "1"), int(r["closed"] == "1"),
+            r["le_ident"], coalesce_int_from_float(r["le_elevation_ft"]), coalesce_int_from_float(r["le_heading_degT"]),
+            coalesce_int_from_float(r["le_displaced_threshold_ft"]),
+            r["he_ident"], coalesce_int_from_float(r["he_elevation_ft"]), coalesce_int_from_float(r["he_heading_degT"]),
+            coalesce_int_from_float(r["he_displaced_threshold_ft"]),
+        ] for r in _read_csv(fps["runways"])))
+
+        if os.path.isfile(fps["frequencies"]):
+            conn.executemany(f"INSERT INTO frequencies (airport_ident, source, {', '.join(FREQUENCY_COLUMNS)}) VALUES ({', '.join('?' * (len(FREQUENCY_COLUMNS) + 2))})", ([
+                f["airport_ident"], "ourairports", f["type"], f["description"], f["frequency_mhz"]
+            ] for f in _read_csv(fps["frequencies"])))
+
+        _update_reports_metar(conn)
+    print(f"Imported {n_airports} airports from OurAirports CSVs in {dir_fp}")
+    return n_airports
+
+def ourairports_available(dir_fp: str=None):
+    return os.path.isfile(os.path.join(coalesce(dir_fp, config["ourairports_fp"]), OURAIRPORTS_FILES["airports"]))
+
+def upsert_airportdb(info: dict):
+    """Store an airportdb.io airport payload"""
+    with get_connection() as conn:
+        _insert_airport(conn, {
+            "ident": info["ident"],
+            "source": "airportdb",
+            "icao_code": info["icao_code"],
+            "iata_code": info["iata_code"],
+            "local_code": info["local_code"],
+            "name": info.get("name"),
+            "lat": coalesce_float(info["latitude_deg"]),
+            "long": coalesce_float(info["longitude_deg"]),
+            "elevation_ft": coalesce_int_from_float(info["elevation_ft"]),
+            "iso_country": info["iso_country"],
+            "reports_metar": _reports_metar(conn, info["ident"], info["local_code"]),
+        }, runways=[{
+            "length_ft": coalesce_int_from_float(r["length_ft"]),
+            "width_ft": coalesce_int_from_float(r["width_ft"]),
+            "surface": r["surface"],
+            "lighted": int(r["lighted"] == "1"),
+            "closed": int(r["closed"] == "1"),
+            "le_ident": r["le_ident"],
+            "le_elevation_ft": coalesce_int_from_float(r["le_elevation_ft"]),
+            "le_heading_degT": coalesce_int_from_float(r["le_heading_degT"]),
+            "le_displaced_threshold_ft": coalesce_int_from_float(r["le_displaced_threshold_ft"]),
+            "he_ident": r["he_ident"],
+            "he_elevation_ft": coalesce_int_from_float(r["he_elevation_ft"]),
+            "he_heading_degT": coalesce_int_from_float(r["he_heading_degT"]),
+            "he_displaced_threshold_ft": coalesce_int_from_float(r["he_displaced_threshold_ft"]),
+        } for r in info["runways"]], frequencies=info["freqs"])
+
+def lookup(code: str, sources: tuple=None):
+    """
+    Find an airport by ICAO code, ident, FAA LID, or IATA code, preferring richer sources & then exact ICAO/ident matches. 
+    Returns a dict of airport columns plus "runways" & "frequencies" lists of dicts, or None.
+    """
+    if not code:
+        return None
+    code = code.upper()
+    # Only known sources are inlined into the query
+    sources = ", ".join(f"'{s}'" for s in coalesce(sources, SOURCE_PREFERENCE) if s in SOURCE_PREFERENCE)
+    conn = get_connection()
+    rows = conn.execute(f"""
+        SELECT *, CASE WHEN icao_code = :code OR ident = :code THEN 0 WHEN local_code = :code THEN 1 ELSE 2 END AS match_rank
+        FROM airports
+        WHERE (icao_code = :code OR ident = :code OR local_code = :code OR iata_code = :code)
+          AND source IN ({sources})
+    """, {"code": code}).fetchall()
+    if not rows:
+        return None
+    row = min(rows, key=lambda r: (SOURCE_PREFERENCE.index(r["source"]), r["match_rank"]))
+    record = {c: row[c] for c in AIRPORT_COLUMNS}
+    record["runways"] = [dict(r) for r in conn.execute(
+        f"SELECT {', '.join(RUNWAY_COLUMNS)} FROM runways WHERE airport_ident = ? AND source = ?", (row["ident"], row["source"]))]
+    record["frequencies"] = [dict(r, airport_ident=row["ident"]) for r in conn.execute(
+        f"SELECT {', '.join(FREQUENCY_COLUMNS)} FROM frequencies WHERE airport_ident = ? AND source = ?", (row["ident"], row["source"]))]
+    return record
+
+def spatial_records():
+    """One record per physical airport with a location, preferring richer sources over duplicate AZOS stations"""
+    rows = get_connection().execute("""
+        SELECT ident, source, icao_code, local_code, iata_code, name, lat, long, reports_metar 
+        FROM airports WHERE lat IS NOT NULL AND long IS NOT NULL
+    """).fetchall()
+    rows = sorted(rows, key=lambda r: SOURCE_PREFERENCE.index(r["source"]))
+    seen_idents, seen_codes, records = set(), set(), []
+    for r in rows:
+        if r["ident"] in seen_idents or (r["source"] == "azos" and r["ident"] in seen_codes):
+            continue
+        seen_idents.add(r["ident"])
+        seen_codes.update(c for c in (r["local_code"], r["ident"]) if c)
+        records.append(dict(r))
+    return records
+
+def metar_station_ids():
+    return [r["ident"] for r in get_connection().execute("SELECT ident FROM airports WHERE source = 'azos'")]
+
+if __name__ == "__main__":
+    # Bulk import, ex. python airport_store.py data/ourairports
+    import sys
+    import_ourairports(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -1,11 +1,20 @@
+import json
 import os
+import threading
 
-from flask import Flask, render_template, send_from_directory, send_file
+from utils import StageTimer, coalesce
+# Startup timing report, boot to first frame on the Pi matters
+startup_timer = StageTimer()
+
+from flask import Flask, render_template, send_from_directory, send_file, jsonify, request, abort
 from flask_sock import Sock
+startup_timer.mark("import flask")
 
+from config import config
 import airport_info as airports
-from aviation_weather import fetch_historical_metar
-from render import render_metar_wind, render_metar_additional_info, render_metar_cloud_cover
+from render import render_panel_cached, render_board, panel_etag, PANEL_RENDERERS, FORMATS, DEFAULT_FORMAT
+from metar_fields import observation_datetime
+startup_timer.mark("import airports & render")
 
 app = Flask(__name__)
 
@@ -20,6 +29,24 @@ else:
 
 from gpio_flask import flask_gpio_manager
 flask_gpio_manager.debug = app.debug
+startup_timer.mark("gpio")
+
+from metar_refresher import metar_refresher
+metar_refresher.start()
+startup_timer.mark("metar refresher")
+
+from metar_hub import metar_hub, station_id, observation_id
+
+# Airport info I/O is lazy by default, optionally warm it up in the background so it's ready for the first request
+if config["startup"]["background_warmup"]:
+    threading.Thread(target=lambda: (airports.warmup(), startup_timer.mark("airports warmup")), daemon=True).start()
+startup_timer.mark("app ready")
+print(startup_timer.report())
+
+@app.after_request
+def mark_first_response(response):
+    startup_timer.mark("first response")
+    return response
 
 TEST_ICAOS = [
     "ksfo",
@@ -51,50 +78,144 @@ def charts_testing():
 #  it is likely more "javascript-onic" to transmit this as a json
 @app.route("/chart_testing/csv_test")
 def csv_test():
+    # Historical dependencies (pandas, pyarrow) are only imported on historical routes
+    from aviation_weather import fetch_historical_metar
+    from climatology import build_climatology
     print("hi!")
     fetch_historical_metar("ksck")
+    build_climatology(airports.get_airport_info("ksck"))
     return "hi!"
 
 @app.route("/metar/<icao>")
 def image_testing(icao):
     # TODO add a text box at the top for the metar text & recency, in courier
-    # TODO update rendering cache here
+    # Keep the board's airport warm so the asset requests never wait on upstream
+    airport = metar_refresher.watch(icao)
+    if airport is None:
+        return f"Unknown station {icao}", 404
+    # Every panel is inlined from one snapshot, so the page is one round trip & one observation
+    fmt = _requested_format()
+    snapshot, panels = render_board(airport, fmt=fmt)
     return render_template("metar.html", 
-                           icao=icao)
+                           icao=icao,
+                           fmt=fmt,
+                           panels=panels,
+                           metar=snapshot.metar,
+                           observation=observation_id(snapshot.metar),
+                           stale=snapshot.metar_is_stale)
+
+@app.route("/climatology/<icao>.json")
+def climatology_typical(icao):
+    """Typical conditions for this month & local hour, fetched after the board's first frame (numpy loads lazily here)"""
+    from climatology import get_climatology
+    climatology = get_climatology(icao)
+    if climatology is None:
+        return jsonify({"error": f"No climatology for {icao}"}), 404
+    return jsonify(climatology.typical_now())
 
-@app.route("/dynamicassets/metar_wind/<icao>.svg")
-def dynamicassets_metar_wind(icao):
+@app.route("/board/<icao>.json")
+def board(icao):
+    """All panels (or ?panels=wind,additional_info) as inline SVG (or PNG with ?format=png), rendered from one METAR snapshot"""
+    panels = request.args["panels"].split(",") if "panels" in request.args else None
+    unknown_panels = [p for p in panels or [] if p not in PANEL_RENDERERS]
+    if unknown_panels:
+        return jsonify({"error": f"Unknown panels {', '.join(unknown_panels)}", "unknown_panels": unknown_panels, 
+                        "panels": list(PANEL_RENDERERS.keys())}), 400
     airport = airports.get_airport_info(icao)
-    wind_buffer = render_metar_wind(airport)
+    if airport is None:
+        return jsonify({"error": f"Unknown station {icao}"}), 404
+    snapshot, panels = render_board(airport, panels, fmt=_requested_format())
+    return jsonify({
+        "station": station_id(airport),
+        "observation": observation_id(snapshot.metar),
+        "raw": snapshot.metar.message if snapshot.metar is not None else None,
+        "stale": snapshot.metar_is_stale,
+        "flight_category": snapshot.flight_category,
+        "panels": panels
+    })
 
-    # TODO render cloud coverage - depict as a simple rectangular bar with shading to indicate layers & text next to it
-    return send_file(
-        wind_buffer,
-        as_attachment=True,
-        download_name=f"{icao}_wind.svg",
-        mimetype="image/svg+xml"
-    )
-
-@app.route("/dynamicassets/metar_additional_info/<icao>.svg")
-def dynamicassets_metar_additional_info(icao):
+def _requested_format(fmt=None):
+    """Output format per client, ?format= overrides the url extension & defaults to the configured format"""
+    fmt = request.args.get("format", coalesce(fmt, DEFAULT_FORMAT)).lower()
+    if fmt not in FORMATS:
+        abort(404)
+    return fmt
+
+def _send_panel(icao, panel, fmt, download_name):
+    """
+    Send a rendered panel with a strong ETag & Last-Modified from the observation, 
+    answering revalidations of an unchanged observation with a 304 before anything is rendered
+    """
+    fmt = _requested_format(fmt)
     airport = airports.get_airport_info(icao)
-    additional_info_buffer = render_metar_additional_info(airport)
-    return send_file(
-        additional_info_buffer,
-        as_attachment=True,
-        download_name=f"{icao}_metar_info.svg",
-        mimetype="image/svg+xml"
-    )
-
-@app.route("/dynamicassets/metar_cloud_cover/<icao>.svg")
-def dynamicassets_metar_cloud_cover(icao):
-    cloud_cover_buffer = render_metar_cloud_cover()
-    return send_file(
-        cloud_cover_buffer,
-        as_attachment=True,
-        download_name=f"{icao}_metar_cloud_cover.svg",
-        mimetype="image/svg+xml"
-    )
+    if airport is None:
+        abort(404)
+    # One snapshot for the validators & the render, so they always describe the same observation
+    snapshot = airport.snapshot()
+    etag = panel_etag(snapshot, panel, fmt)
+    last_modified = observation_datetime(snapshot.metar) if snapshot.metar is not None else None
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = last_modified is not None and request.if_modified_since is not None and last_modified <= request.if_modified_since
+    if not_modified:
+        response = app.response_class(status=304)
+    else:
+        response = send_file(
+            render_panel_cached(snapshot, panel, fmt),
+            download_name=f"{download_name}.{fmt}",
+            mimetype=FORMATS[fmt],
+            etag=False,
+            conditional=False
+        )
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Panels change whenever a new report arrives, so caches may store them but must revalidate (cheap, see above)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+@app.route("/dynamicassets/metar_wind/<icao>.<fmt>")
+def dynamicassets_metar_wind(icao, fmt):
+    # TODO render cloud coverage - depict as a simple rectangular bar with shading to indicate layers & text next to it
+    return _send_panel(icao, "wind", fmt, f"{icao}_wind")
+
+@app.route("/dynamicassets/metar_additional_info/<icao>.<fmt>")
+def dynamicassets_metar_additional_info(icao, fmt):
+    return _send_panel(icao, "additional_info", fmt, f"{icao}_metar_info")
+
+@app.route("/dynamicassets/metar_cloud_cover/<icao>.<fmt>")
+def dynamicassets_metar_cloud_cover(icao, fmt):
+    return _send_panel(icao, "cloud_cover", fmt, f"{icao}_metar_cloud_cover")
+
+@app.route("/render_benchmark/<icao>")
+def render_benchmark(icao):
+    """Client side fetch & decode time of each panel as SVG vs PNG, run it in the kiosk browser"""
+    return render_template("render_benchmark.html", icao=icao, panels=list(PANEL_RENDERERS.keys()), formats=list(FORMATS.keys()))
+
+@app.route("/airports/near")
+def airports_near():
+    """Nearby airports, ex. /airports/near?lat=37.9&lon=-121.2&nm=50&metar_only=1 or &k=5 for the nearest 5"""
+    from spatial_index import get_spatial_index
+    airports.warmup()
+    index = get_spatial_index()
+    lat, lon = float(request.args["lat"]), float(request.args["lon"])
+    metar_only = request.args.get("metar_only", "0") == "1"
+    if "nm" in request.args:
+        results = index.within_radius(lat, lon, float(request.args["nm"]), metar_only=metar_only)
+    else:
+        results = index.nearest(lat, lon, int(request.args.get("k", 5)), metar_only=metar_only)
+    return jsonify(results)
+
+@app.route("/airport_cache")
+def airport_cache_stats():
+    return jsonify(airports.AIRPORT_CACHE.stats())
+
+@app.route("/startup_report")
+def startup_report():
+    return jsonify(startup_timer.to_dict())
 
 @app.route("/favicon.ico")
 def favicon():
@@ -104,11 +225,49 @@ def favicon():
 def root():
     return "Boop."
 
+@sock.route("/metar_updates")
+def metar_updates(ws):
+    """
+    Push METAR updates for subscribed stations, clients send {"subscribe": ["ksck", ...]} or {"unsubscribe": [...]}. 
+    Subscribed stations are kept warm by the background refresher, which publishes new reports to all subscribers at once.
+    """
+    try:
+        while True:
+            data = ws.receive()
+            if data is None:
+                continue
+            command = json.loads(data)
+            for icao in command.get("subscribe", []):
+                airport = metar_refresher.watch(icao)
+                if airport is None:
+                    metar_hub.send(ws, {"type": "error", "icao": icao, "message": "unknown station"})
+                    continue
+                station = metar_hub.subscribe(ws, airport)
+                metar_hub.send(ws, {"type": "subscribed", "icao": icao, "station": station})
+            for icao in command.get("unsubscribe", []):
+                airport = airports.AIRPORT_CACHE.peek(icao.upper())
+                metar_hub.unsubscribe(ws, station_id(airport) if airport is not None else icao)
+    finally:
+        metar_hub.remove(ws)
+
+@app.route("/gpio_latency")
+def gpio_latency():
+    return jsonify(flask_gpio_manager.latency_stats())
+
 @sock.route("/echo")
 def echo(ws):
+    """GPIO channel, state deltas are pushed as they happen while client commands & acks are read here"""
     fgm = flask_gpio_manager
-    fgm.send_gpio_state(ws, app.debug)
+
+    def push():
+        try:
+            fgm.stream_gpio_events(ws, app.debug, connected=lambda: ws.connected)
+        except Exception:
+            # Socket closed
+            pass
+    threading.Thread(target=push, name="gpio_push", daemon=True).start()
+
     while True:
         data = ws.receive()
-        fgm.read_client_commands(data)
-        fgm.send_gpio_state(ws, app.debug)
\ No newline at end of file
+        if data is not None:
+            fgm.read_client_commands(data)
\ No newline at end of file
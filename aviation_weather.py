@@ -11,107 +11,190 @@ Any other weather observations I'm missing (AIRMET, SIGMET)
 Check aviationweather & foreflight
 """
 
-import requests
-import httpx
-import urllib.parse
+import asyncio
 import re
 import time
-import pandas as pd
-from io import StringIO
-from datetime import datetime
 from metar_taf_parser.parser.parser import MetarParser, TAFParser
 
+import upstream
+from upstream import UpstreamError
+from utils import coalesce
+
 # API URLs
 AVIATIONWEATHER_METAR_API_URL = "https://aviationweather.gov/api/data/metar"
 AVIATIONWEATHER_TAF_API_URL = "https://aviationweather.gov/api/data/taf"
 
-def aviationweather_api_request(url: str, **params):
-    full_url = f"{url}?{urllib.parse.urlencode(params)}"
-    response = requests.get(full_url)
+# aviationweather accepts comma separated ids, keep URLs to a reasonable length
+AVIATIONWEATHER_MAX_IDS_PER_REQUEST = 100
 
-    if response is None or response.status_code != 200:
-        print(f"Request to {full_url} returned status code {response.status_code}")
+def aviationweather_api_request(url: str, **params):
+    """Returns the response text, raises UpstreamError if the request fails. No data (204) returns an empty string."""
+    response = upstream.get(url, params=params)
+    if response.status_code == 204:
+        return ""
+    return response.text
 
+async def aviationweather_api_request_async(client, url: str, **params):
+    """Async equivalent of aviationweather_api_request using a client from upstream.new_async_client"""
+    response = await upstream.get_async(client, url, params=params)
+    if response.status_code == 204:
+        return ""
     return response.text
 
+def _should_retry_kilo(icao_like_id: str):
+    return not (icao_like_id.startswith("k") and len(icao_like_id) == 4)
+
+def _clean_taf_text(taf_text: str):
+    # Clean TAF string
+    taf_text = re.sub(r"\s+", " ", taf_text).strip().replace("\n", "").upper()
+
+    # Append TAF identifier if not included
+    if not taf_text.startswith("TAF"):
+        taf_text = f"TAF {taf_text}"
+    return taf_text
+
 def fetch_latest_metar(icao_like_id: str, madis: bool=False, retry_kilo: bool=True):
     if madis:
         raise ValueError("MADIS METAR is not currently supported")
     icao_like_id = icao_like_id.lower()
-    metar_text = aviationweather_api_request(AVIATIONWEATHER_METAR_API_URL, 
-                                             ids=icao_like_id)
+    try:
+        metar_text = aviationweather_api_request(AVIATIONWEATHER_METAR_API_URL, 
+                                                 ids=icao_like_id)
+    except UpstreamError as e:
+        print(e)
+        return None
     try: 
         metar = MetarParser().parse(metar_text)
         return metar
     except:
-        if retry_kilo and (not (icao_like_id.startswith("k") and len(icao_like_id) == 4)):
+        if retry_kilo and _should_retry_kilo(icao_like_id):
             return fetch_latest_metar("k" + icao_like_id, retry_kilo=False)
         return None
 
 def fetch_latest_taf(icao_like_id: str, retry_kilo: bool=True):
     icao_like_id = icao_like_id.lower()
-    taf_text = aviationweather_api_request(AVIATIONWEATHER_TAF_API_URL, 
-                                           ids=icao_like_id)
-    
-    # Clean TAF string
-    taf_text = re.sub(r"\s+", " ", taf_text).strip().replace("\n", "").upper()
-
-    # Append TAF identifier if not included
-    if not taf_text.startswith("TAF"):
-        taf_text = f"TAF {taf_text}"
+    try:
+        taf_text = aviationweather_api_request(AVIATIONWEATHER_TAF_API_URL, 
+                                               ids=icao_like_id)
+    except UpstreamError as e:
+        print(e)
+        return ""
+    taf_text = _clean_taf_text(taf_text)
 
     try:
         taf = TAFParser().parse(taf_text)
         return taf.message
     except:
-        if retry_kilo and (not (icao_like_id.startswith("k") and len(icao_like_id) == 4)):
+        if retry_kilo and _should_retry_kilo(icao_like_id):
             return fetch_latest_taf("k" + icao_like_id, retry_kilo=False)
         return ""
+
+async def _fetch_latest_async(client, url: str, icao_like_id: str, parse, retry_kilo: bool):
+    """Request the station & its K-prefixed fallback concurrently, returns the first successfully parsed result (or None)"""
+    icao_like_id = icao_like_id.lower()
+    ids = [icao_like_id] + ([f"k{icao_like_id}"] if retry_kilo and _should_retry_kilo(icao_like_id) else [])
+    texts = await asyncio.gather(*[aviationweather_api_request_async(client, url, ids=i) for i in ids], return_exceptions=True)
+    for text in texts:
+        if isinstance(text, UpstreamError):
+            print(text)
+            continue
+        if isinstance(text, BaseException):
+            raise text
+        try:
+            return parse(text)
+        except:
+            continue
+    return None
+
+async def fetch_latest_metar_async(client, icao_like_id: str, retry_kilo: bool=True):
+    """Async equivalent of fetch_latest_metar, with the K-prefixed fallback requested concurrently"""
+    return await _fetch_latest_async(client, AVIATIONWEATHER_METAR_API_URL, icao_like_id, 
+                                     lambda text: MetarParser().parse(text), retry_kilo)
+
+async def fetch_latest_taf_async(client, icao_like_id: str, retry_kilo: bool=True):
+    """Async equivalent of fetch_latest_taf, with the K-prefixed fallback requested concurrently"""
+    taf = await _fetch_latest_async(client, AVIATIONWEATHER_TAF_API_URL, icao_like_id, 
+                                    lambda text: TAFParser().parse(_clean_taf_text(text)).message, retry_kilo)
+    return coalesce(taf, "")
+
+def _batch_request(url: str, icao_like_ids: list, retry_kilo: bool):
+    """
+    Request many stations in as few aviationweather requests as possible. 
+    Returns the raw response texts & a map of requested id => ids to look for in the response, in order of preference.
+    """
+    icao_like_ids = [i.lower() for i in icao_like_ids]
+    candidates = dict()
+    for i in icao_like_ids:
+        candidates[i] = [i] + ([f"k{i}"] if retry_kilo and _should_retry_kilo(i) else [])
+    request_ids = list(dict.fromkeys(c for cs in candidates.values() for c in cs))
+
+    texts = []
+    for start in range(0, len(request_ids), AVIATIONWEATHER_MAX_IDS_PER_REQUEST):
+        chunk = request_ids[start:start + AVIATIONWEATHER_MAX_IDS_PER_REQUEST]
+        texts.append(aviationweather_api_request(url, ids=",".join(chunk)))
+    return texts, candidates
+
+def fetch_latest_metars(icao_like_ids: list, retry_kilo: bool=True):
+    """Fetch the latest METAR for many stations at once, returns dict of lowercase requested id => Metar (or None)"""
+    texts, candidates = _batch_request(AVIATIONWEATHER_METAR_API_URL, icao_like_ids, retry_kilo)
+
+    # One report per line, keep the first (most recent) report per station
+    parsed = dict()
+    for text in texts:
+        for line in text.splitlines():
+            line = re.sub(r"^(METAR|SPECI)\s+", "", line.strip())
+            if not line:
+                continue
+            try:
+                metar = MetarParser().parse(line)
+            except:
+                continue
+            parsed.setdefault(metar.station.lower(), metar)
+
+    return {i: next((parsed[c] for c in cs if c in parsed), None) for i, cs in candidates.items()}
+
+def fetch_latest_tafs(icao_like_ids: list, retry_kilo: bool=True):
+    """Fetch the latest TAF for many stations at once, returns dict of lowercase requested id => TAF message (or "")"""
+    texts, candidates = _batch_request(AVIATIONWEATHER_TAF_API_URL, icao_like_ids, retry_kilo)
+
+    # Each TAF starts on an unindented line, with change groups on indented continuation lines
+    raw_tafs = []
+    for text in texts:
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            if raw_tafs and line[0].isspace():
+                raw_tafs[-1] += f" {line}"
+            else:
+                raw_tafs.append(line)
+
+    parsed = dict()
+    for raw_taf in raw_tafs:
+        try:
+            taf = TAFParser().parse(_clean_taf_text(raw_taf))
+        except:
+            continue
+        parsed.setdefault(taf.station.lower(), taf.message)
+
+    return {i: next((parsed[c] for c in cs if c in parsed), "") for i, cs in candidates.items()}
     
 def fetch_historical_metar(icao_like_id: str, retry_no_kilo: bool=True, check_cache: bool=True):
     # TODO fetch & process historical data for fast access in the future
     # need to be mindful of memory requirements - ksck has 5m reports & going back to mid 2016, the file size is 167mb
-    # can mostly copy previous code
-    # note the code should be local & UPPER CASE 
-    # SCK NOT sck or ksck or KSCK
-    icao_like_id = icao_like_id.lower()
+    # so this streams into per station & year parquet partitions, see history.py
+    from history import update_history, read_fields, iem_station_id
+    station = iem_station_id(icao_like_id)
 
     # TODO implement retry no kilo
-    # TODO implement cache - likely move the logic into a helper
-    # TODO implement this on a yearly basis, so then the computation isn't as much
     # TODO really we want to start this fetching & computation while the metar is loading
 
-    dt1 = datetime.strptime("2024-01-01", "%Y-%m-%d")
-    dt2 = datetime.strptime("2024-12-31", "%Y-%m-%d")
-    uri = (
-        "http://mesonet.agron.iastate.edu/cgi-bin/request/asos.py?"
-        f"station={icao_like_id.upper()}"
-        f"&year1={dt1.year}&month1={dt1.month}&day1={dt1.day}"
-        f"&year2={dt2.year}&month2={dt2.month}&day2={dt2.day}"
-        "&data=all&direct=yes&latlon=no&elev=no&missing=M&trace=T&Etc%2FUTC&format=onlycomma&report_type=1&report_type=3&report_type=4"
-    )
-    print("start waiting...")
+    # Only date ranges that aren't stored yet are downloaded, & only changed years are re-extracted
     st = time.time()
-    # response = httpx.get(uri, timeout=60 * 5)
-    # text = response.text
-    # df = pd.read_csv(StringIO(text))
-    # df.to_csv("data/testing.csv")
-    print("time to fetch:")
-    df = pd.read_csv("data/testing.csv")
-    print(time.time() - st)
+    update_history(station)
+    df = read_fields(station)
+    print(f"time to fetch: {time.time() - st}")
     print(f"fetched: {df.shape[0]} rows")
-    st = time.time()
-    print("parsing")
-    # TODO from this, compute & store the monthly...
-    #  p10, p25, p50, p75, p90, average days
-    # I think best approach is
-    #  keep data as a dataframe for computing monthly hourly averages
-    #  then store it as a csv or json or something
-    #  then when loading it / working with it live, have a wrapper class
-    #  cause we may store additional info like % chance of gust, etc
-    
-    df["metar_obj"] = df["metar"].apply(lambda metar: MetarParser().parse(metar))
-
+    # Monthly / hourly p10, p25, p50, p75, p90 & frequencies are precomputed in climatology.py
     # Crosswind
     # Cloud ceiling
     # Flight category
@@ -119,8 +202,6 @@ def fetch_historical_metar(icao_like_id: str, retry_no_kilo: bool=True, check_ca
     # print(df.head(10))
     print(df.columns)
 
-    print(time.time() - st)
-
 
 def fetch_parse_historical_weather(icao_like_id: str, retry_no_kilo: bool=True, check_cache: bool=True):
     """
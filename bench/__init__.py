@@ -0,0 +1 @@
+"""Benchmarks, run from the repo root, ex. python -m bench.spatial_index"""
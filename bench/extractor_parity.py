@@ -0,0 +1,88 @@
+"""
+Parity check of history.extract_metar_fields against full METAR parsing over a fixture corpus, run from the repo root:
+
+    python -m bench.extractor_parity
+
+The corpus covers the groups the vectorized extractor decodes itself (VV ceilings, fractional visibility, CB/TCU
+/// layers, VRB & gusts, missing dew points) plus ones that must fall back to the parser (ex. M1/4SM).
+Exits 1 if any row disagrees, with & without the parser fallback.
+"""
+
+import sys
+
+import numpy as np
+
+from history import PARSED_METAR_FIELDS, extract_metar_fields, parse_metars_parallel, verify_extractor_parity
+
+FIXTURE_METARS = [
+    # Plain VFR
+    "KSFO 161756Z 29015KT 10SM FEW008 SCT200 18/12 A3002",
+    # Gusts & variation
+    "KSCK 161753Z 31018G28KT 280V340 10SM CLR 24/06 A2996",
+    "KSQL 161750Z 27009G17KT 10SM BKN015 OVC030 17/11 A3001 RMK AO2 SLP163",
+    "KMWH 161753Z 21033G45KT 5SM BR BKN007 OVC012 08/07 A2978",
+    # VRB & calm
+    "KLVK 161753Z VRB03KT 10SM SKC 22/09 A3004",
+    "KPAO 161747Z 00000KT 10SM CLR 16/10 A3003",
+    "KJFK 161751Z VRB05G15KT 10SM FEW040 19/07 A2999",
+    # Vertical visibility ceilings
+    "KACV 161756Z 00000KT 1/4SM FG VV001 11/11 A3010",
+    "KSMF 161756Z 16004KT 1/2SM FG VV002 08/08 A3021",
+    "KOAK 161753Z 28006KT 3SM BR VV010 13/12 A3008",
+    # Fractional & mixed visibility
+    "KSTS 161753Z 00000KT 1 1/2SM BR OVC004 12/11 A3012",
+    "KBFL 161754Z 32005KT 2 1/2SM HZ SCT250 29/10 A2990",
+    "KRDD 161753Z 34008KT 3/4SM -RA BKN006 OVC010 10/09 A2994",
+    "KEKA 161756Z 17011KT 1/8SM FG OVC001 10/10 A3005",
+    # M/P visibility, falls back to the parser
+    "KCEC 161756Z 00000KT M1/4SM FG VV000 09/09 A3018",
+    "KDEN 161753Z 18012KT P6SM SCT100 25/M02 A3010",
+    # CB & TCU layers
+    "KMIA 161753Z 09014G24KT 6SM TSRA BKN025CB OVC080 27/24 A2992",
+    "KTPA 161753Z 25008KT 10SM SCT030TCU BKN050 31/23 A2997",
+    "KMCO 161753Z 20010KT 4SM +TSRA OVC015CB 24/22 A2990",
+    # Unknown cloud type from automated stations
+    "KSNS 161753Z AUTO 30012KT 10SM BKN010/// OVC025 16/11 A3004",
+    "KMRY 161754Z AUTO 31008KT 10SM SCT008/// OVC015/// 17/12 A3003",
+    # Negative temperatures & a missing dew point
+    "KFAI 161753Z 03006KT 10SM OVC020 M12/M15 A3032",
+    "KBRW 161753Z 08018KT 2SM -SN BLSN OVC008 M25/ A2998",
+    "KBTV 161754Z 34010KT 10SM BKN045 02/ A3001",
+    # Metric visibility & missing groups, fall back to the parser
+    "EGLL 161750Z 24012KT 9999 SCT030 14/08 Q1018",
+    "KMRY 161754Z AUTO 10SM CLR 17/12 A3003 RMK AO2",
+    "KSNS 161753Z AUTO 30012KT 10SM BKN/// 16/11 A3004",
+]
+
+def _mismatched_rows(extracted, parsed):
+    return ~np.isclose(extracted.to_numpy(dtype=float), parsed.to_numpy(dtype=float), equal_nan=True).all(axis=1)
+
+def main():
+    # Decoded rows only, undecoded ones are NaN without the fallback
+    mismatches = verify_extractor_parity(FIXTURE_METARS)
+
+    # Every row once fallen back rows are filled in by the parser
+    extracted = extract_metar_fields(FIXTURE_METARS, fallback=True)
+    parsed = parse_metars_parallel(FIXTURE_METARS, n_workers=1)
+    fallback_mismatched = _mismatched_rows(extracted, parsed)
+
+    for i, metar in enumerate(FIXTURE_METARS):
+        if fallback_mismatched[i]:
+            print(f"MISMATCH (with fallback) {metar}")
+            for field in PARSED_METAR_FIELDS:
+                e, p = extracted.at[i, field], parsed.at[i, field]
+                if not np.isclose(e, p, equal_nan=True):
+                    print(f"    {field}: extracted {e} parsed {p}")
+    for _, row in mismatches.iterrows():
+        print(f"MISMATCH {row['metar']}")
+        for field in PARSED_METAR_FIELDS:
+            e, p = row[field], row[f"{field}_parsed"]
+            if not np.isclose(e, p, equal_nan=True):
+                print(f"    {field}: extracted {e} parsed {p}")
+
+    n_failed = len(mismatches) + int(fallback_mismatched.sum())
+    print(f"{len(FIXTURE_METARS)} METARs, {len(mismatches)} extractor mismatches, {int(fallback_mismatched.sum())} with fallback")
+    return 1 if n_failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
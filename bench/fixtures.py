@@ -0,0 +1,69 @@
+"""Offline airports & METARs for benchmarks, nothing here touches the network or the airport store"""
+
+import random
+
+from metar_taf_parser.parser.parser import MetarParser
+
+from airport_info import Airport, Frequency, Runway
+
+SURFACES = ["ASP", "CON", "TURF", "GRVL", "ASP-CON", "WATER"]
+FREQUENCY_TYPES = ["ATIS", "TWR", "GND", "CTAF", "UNIC", "APP", "DEP", "CLD"]
+
+def make_runway(heading: int, suffix: str="", length_ft: int=8000, surface: str="ASP"):
+    """Runway with the low end at the given true heading (e.g. 118 -> 12/30)"""
+    le_num = round(heading / 10) % 36 or 36
+    he_num = (le_num + 18) % 36 or 36
+    he_suffix = {"L": "R", "R": "L"}.get(suffix, suffix)
+    return Runway(
+        length_ft=length_ft, width_ft=150, surface=surface, lighted=True, closed=False,
+        le_ident=f"{le_num:02d}{suffix}", le_elevation_ft=10, le_heading_degT=heading, le_displaced_threshold_ft=0,
+        he_ident=f"{he_num:02d}{he_suffix}", he_elevation_ft=10, he_heading_degT=(heading + 180) % 360, he_displaced_threshold_ft=0
+    )
+
+def make_frequency(ident: str, type: str="TWR", frequency_mhz: str="120.5"):
+    return Frequency(airport_ident=ident, type=type, description=f"{ident} {type}", frequency_mhz=frequency_mhz)
+
+def parse_metar(text: str):
+    return MetarParser().parse(text)
+
+def make_airport(ident: str, runways: list, metar_text: str, frequencies: list=None):
+    """Airport constructed fully offline from a raw METAR"""
+    airport = Airport(
+        ident=ident, icao_code=ident, iata_code=ident[1:], local_code=ident[1:],
+        lat=37.0, long=-122.0, elevation_ft=10, iso_country="US",
+        runways=runways, frequencies=frequencies or [], metar=parse_metar(metar_text), fast_compute=True
+    )
+    # Serve the given METAR indefinitely instead of refetching once it expires
+    airport.background_refresh = True
+    return airport
+
+def ksfo(metar_text: str="KSFO 161756Z 29015G25KT 10SM FEW008 SCT150 18/12 A3002"):
+    """Multi-runway airport, 01L/R-19L/R & 10L/R-28L/R"""
+    return make_airport("KSFO", [
+        make_runway(28, "L", 7650), make_runway(28, "R", 8650),
+        make_runway(118, "L", 11870), make_runway(118, "R", 10600)
+    ], metar_text, [make_frequency("KSFO", t) for t in ("ATIS", "TWR", "GND", "CLD", "APP", "DEP")])
+
+def single_runway(metar_text: str, ident: str="KSCK"):
+    return make_airport(ident, [make_runway(118, "", 10650)], metar_text)
+
+# Wind scenarios covering each RunwayWindInfo branch, name -> airport
+SCENARIOS = {
+    "calm": lambda: single_runway("KSCK 161753Z 00000KT 10SM CLR 22/08 A3001"),
+    "vrb": lambda: single_runway("KSCK 161753Z VRB04KT 10SM CLR 22/08 A3001"),
+    "steady": lambda: single_runway("KSCK 161753Z 31012KT 10SM FEW040 22/08 A3001"),
+    "gusting": lambda: single_runway("KSCK 161753Z 31018G29KT 10SM FEW040 22/08 A3001"),
+    "variable": lambda: single_runway("KSCK 161753Z 31012G20KT 280V340 10SM FEW040 22/08 A3001"),
+    "left_crosswind": lambda: single_runway("KSCK 161753Z 03015KT 3SM BR OVC009 22/08 A3001"),
+    "ksfo": lambda: ksfo(),
+    "ksfo_ifr": lambda: ksfo("KSFO 161756Z 14008KT 1 1/2SM BR OVC004 14/13 A2992"),
+}
+
+def random_runways(n: int, seed: int=0):
+    rng = random.Random(seed)
+    return [make_runway(rng.randrange(1, 180), rng.choice(["", "L", "R", "C"]), rng.randrange(1500, 12000), rng.choice(SURFACES)) 
+            for _ in range(n)]
+
+def random_frequencies(n: int, seed: int=0):
+    rng = random.Random(seed)
+    return [make_frequency(f"K{i % 10000:04d}", rng.choice(FREQUENCY_TYPES), f"{rng.uniform(118, 136):.3f}") for i in range(n)]
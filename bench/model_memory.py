@@ -0,0 +1,57 @@
+"""
+Memory held by the airport models for a large airport set, run with python -m bench.model_memory. 
+Compares the slotted Runway & Frequency against equivalent plain dataclasses (the previous representation). 
+"""
+
+import dataclasses
+import gc
+import tracemalloc
+
+from airport_info import Airport, Frequency, Runway
+from bench import fixtures
+
+N_RUNWAYS = 50_000
+N_FREQUENCIES = 50_000
+N_AIRPORTS = 2_000
+
+def _plain_dataclass(cls):
+    """Same fields as cls, without slots"""
+    return dataclasses.make_dataclass(f"Plain{cls.__name__}", [(f.name, f.type) for f in dataclasses.fields(cls) if f.init])
+
+def measure(build):
+    """Bytes allocated & still held by the result of build()"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+def _report(name, size, n):
+    print(f"{name:<34} {size / 2**20:8.2f}MiB {size / n:8.1f}B / instance")
+
+def main():
+    runways = fixtures.random_runways(N_RUNWAYS)
+    frequencies = fixtures.random_frequencies(N_FREQUENCIES)
+    rw_kwargs = [{f.name: getattr(r, f.name) for f in dataclasses.fields(Runway) if f.init} for r in runways]
+    freq_kwargs = [{f.name: getattr(fr, f.name) for f in dataclasses.fields(Frequency)} for fr in frequencies]
+
+    for name, cls, kwargs in [("Runway", Runway, rw_kwargs), ("Frequency", Frequency, freq_kwargs)]:
+        plain_cls = _plain_dataclass(cls)
+        plain_size, _ = measure(lambda: [plain_cls(**kw) for kw in kwargs])
+        slotted_size, _ = measure(lambda: [cls(**kw) for kw in kwargs])
+        _report(f"{name} (plain dataclass)", plain_size, len(kwargs))
+        _report(f"{name} (slotted)", slotted_size, len(kwargs))
+        print(f"{'':<34} {slotted_size / plain_size:8.0%} of plain")
+
+    # Full airports incl. parsed METAR & runway wind info, sharing the runways built above
+    metar = fixtures.parse_metar("KSFO 161756Z 29015G25KT 250V320 10SM FEW008 SCT150 18/12 A3002")
+    def build_airports():
+        return [Airport(ident=f"K{i:03d}", icao_code=f"K{i:03d}", iata_code=None, local_code=None, lat=0.0, long=0.0, 
+                        elevation_ft=0, iso_country="US", runways=runways[i * 4:(i + 1) * 4], frequencies=[], metar=metar) 
+                for i in range(N_AIRPORTS)]
+    size, _ = measure(build_airports)
+    _report("Airport + RunwayWindInfo", size, N_AIRPORTS)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Server side render time & size of each panel as SVG vs PNG, plus PNG decode time (Pillow), run with python -m bench.render_formats. 
+Browser decode & rasterization of both formats is measured on the kiosk itself at /render_benchmark/<icao>. 
+"""
+
+import time
+from io import BytesIO
+
+import render
+from bench import fixtures
+
+N_RENDERS = 50
+
+def time_per_call(fn, n=N_RENDERS):
+    fn()
+    st = time.perf_counter()
+    for _ in range(n):
+        result = fn()
+    return (time.perf_counter() - st) / n, result
+
+def main():
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    airport = fixtures.ksfo()
+    print(f"{'panel':<16} {'format':<6} {'render ms':>10} {'bytes':>8} {'decode ms':>10}")
+    for panel, renderer in render.PANEL_RENDERERS.items():
+        for fmt in render.FORMATS.keys():
+            # Uncached renders, the cost of each new observation
+            render_s, output = time_per_call(lambda: renderer(airport, fmt).getvalue())
+            decode = ""
+            if fmt == "png" and Image is not None:
+                decode_s, _ = time_per_call(lambda: Image.open(BytesIO(output)).load())
+                decode = f"{decode_s * 1000:10.2f}"
+            print(f"{panel:<16} {fmt:<6} {render_s * 1000:10.2f} {len(output):8d} {decode:>10}")
+
+if __name__ == "__main__":
+    main()
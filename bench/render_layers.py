@@ -0,0 +1,33 @@
+"""Wind panel render cost with & without pre-recorded static layers, run with python -m bench.render_layers"""
+
+import time
+
+import render
+from bench import fixtures
+
+N_RENDERS = 200
+
+WINDS = {
+    "steady": "KSFO 161756Z 29015KT 10SM FEW008 SCT150 18/12 A3002",
+    "gusting": "KSFO 161756Z 29015G28KT 10SM FEW008 SCT150 18/12 A3002",
+}
+
+def renders_per_s(airport, static_layers, n=N_RENDERS):
+    # Warm up, records the layers on the first layered render
+    render.render_metar_wind(airport, static_layers=static_layers)
+    st = time.perf_counter()
+    for _ in range(n):
+        render.render_metar_wind(airport, static_layers=static_layers)
+    return n / (time.perf_counter() - st)
+
+def main():
+    for name, metar_text in WINDS.items():
+        airport = fixtures.ksfo(metar_text)
+        redraw = renders_per_s(airport, static_layers=False)
+        layered = renders_per_s(airport, static_layers=True)
+        print(f"{name:<10} redraw {redraw:8.1f}/s   layered {layered:8.1f}/s   {layered / redraw:5.2f}x")
+    if not render.WIND_GAUGE_ACTIVE_OPAQUE:
+        print("Active gauge colors aren't opaque, static layers are disabled for the wind gauge & panel")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Render benchmark suite over offline fixtures, run from the repo root:
+
+    python -m bench.render_suite                     # compare against the stored baseline, exit 1 on a regression
+    python -m bench.render_suite --update-baseline   # store this machine's results as the baseline
+    python -m bench.render_suite --ci                # also exit 1 if there's no baseline or it's missing a case
+
+Measures renders/sec (best of several repeats, uncached) & memory allocated per render for render_metar_wind & 
+render_metar_additional_info. Baselines are machine specific, record them on the Pi the board runs on. 
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import render
+from bench import fixtures
+
+BASELINE_FP = os.path.join(os.path.dirname(__file__), "render_baseline.json")
+
+# Fail when throughput drops by more than this fraction, or allocations grow by more than this fraction
+DEFAULT_THRESHOLDS = {
+    "renders_per_s": 0.2,
+    "peak_bytes_per_render": 0.25,
+}
+
+RENDERERS = {
+    "wind": render.render_metar_wind,
+    "additional_info": render.render_metar_additional_info,
+}
+
+def measure_throughput(fn, n, repeats):
+    fn()
+    best = 0
+    for _ in range(repeats):
+        st = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = max(best, n / (time.perf_counter() - st))
+    return best
+
+def measure_allocations(fn, n=10):
+    """Peak memory allocated during a render (above what was already traced), & memory still held per render after"""
+    fn()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    peak_bytes = 0
+    for _ in range(n):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - current)
+    stats = tracemalloc.take_snapshot().compare_to(before, "filename")
+    tracemalloc.stop()
+    return {
+        "peak_bytes_per_render": peak_bytes,
+        "held_bytes_per_render": sum(st.size_diff for st in stats) / n,
+        "held_blocks_per_render": sum(st.count_diff for st in stats) / n
+    }
+
+def run(n, repeats):
+    results = dict()
+    for scenario, build in fixtures.SCENARIOS.items():
+        airport = build()
+        for panel, renderer in RENDERERS.items():
+            fn = lambda: renderer(airport)
+            results[f"{panel}/{scenario}"] = {
+                "renders_per_s": measure_throughput(fn, n, repeats),
+                **measure_allocations(fn)
+            }
+    return results
+
+def machine():
+    return {"platform": platform.platform(), "machine": platform.machine(), "python": platform.python_version(), 
+            "static_layers": render.STATIC_LAYERS}
+
+def compare(results, baseline, strict=False):
+    """Regression messages for every case beyond the baseline's thresholds, & cases missing from it if strict"""
+    thresholds = {**DEFAULT_THRESHOLDS, **baseline.get("thresholds", {})}
+    regressions = []
+    for case, r in results.items():
+        b = baseline["results"].get(case)
+        if b is None:
+            if strict:
+                regressions.append(f"{case}: not in the baseline, record one with --update-baseline")
+            continue
+        if r["renders_per_s"] < b["renders_per_s"] * (1 - thresholds["renders_per_s"]):
+            regressions.append(f"{case}: {r['renders_per_s']:.1f} renders/s vs baseline {b['renders_per_s']:.1f}")
+        if r["peak_bytes_per_render"] > b["peak_bytes_per_render"] * (1 + thresholds["peak_bytes_per_render"]):
+            regressions.append(f"{case}: {r['peak_bytes_per_render'] / 1024:.1f}KiB peak / render vs baseline {b['peak_bytes_per_render'] / 1024:.1f}KiB")
+    return regressions
+
+def print_results(results, baseline=None):
+    print(f"{'case':<32} {'renders/s':>10} {'vs base':>8} {'peak KiB':>9} {'held B':>8}")
+    for case, r in results.items():
+        b = (baseline or {}).get("results", {}).get(case)
+        vs = f"{r['renders_per_s'] / b['renders_per_s']:7.2f}x" if b else f"{'-':>8}"
+        print(f"{case:<32} {r['renders_per_s']:10.1f} {vs} {r['peak_bytes_per_render'] / 1024:9.1f} {r['held_bytes_per_render']:8.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update-baseline", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--ci", action="store_true", help="fail if there's no baseline instead of skipping the comparison")
+    parser.add_argument("-n", type=int, default=50, help="renders per repeat")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.n, args.repeats)
+    baseline = None
+    if os.path.isfile(BASELINE_FP):
+        with open(BASELINE_FP, "r") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        thresholds = baseline.get("thresholds", DEFAULT_THRESHOLDS) if baseline else DEFAULT_THRESHOLDS
+        with open(BASELINE_FP, "w") as f:
+            json.dump({"machine": machine(), "thresholds": thresholds, "results": results}, f, indent=4)
+        print(f"Baseline written to {BASELINE_FP}")
+        return 0
+    if baseline is None:
+        print(f"No baseline at {BASELINE_FP}, record one with --update-baseline")
+        return 1 if args.ci else 0
+    if baseline.get("machine") != machine():
+        print(f"Warning: baseline was recorded on {baseline.get('machine')}, comparisons across machines aren't meaningful")
+
+    regressions = compare(results, baseline, strict=args.ci)
+    for r in regressions:
+        print(f"REGRESSION {r}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
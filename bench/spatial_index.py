@@ -0,0 +1,51 @@
+"""Query latency of the spatial index over a full size synthetic airport set (OurAirports has ~80k airports)"""
+
+import random
+import time
+
+import numpy as np
+
+from spatial_index import SpatialIndex, haversine_nm
+
+N_AIRPORTS = 80_000
+N_QUERIES = 2_000
+
+def synthetic_records(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        # Cluster most airports over land-ish latitudes like the real dataset
+        lat = max(min(rng.gauss(35, 20), 89.9), -89.9)
+        records.append({"ident": f"X{i:05d}", "lat": lat, "long": rng.uniform(-180, 180), "reports_metar": rng.random() < 0.1})
+    return records
+
+def time_queries(name, fn, points):
+    st = time.perf_counter()
+    for lat, lon in points:
+        fn(lat, lon)
+    dt = (time.perf_counter() - st) / len(points)
+    print(f"{name:<36} {dt * 1e6:8.1f}us / query")
+    return dt
+
+def main():
+    records = synthetic_records(N_AIRPORTS)
+    st = time.perf_counter()
+    index = SpatialIndex(records)
+    print(f"Built index over {len(index)} airports in {(time.perf_counter() - st) * 1000:.1f}ms")
+
+    rng = random.Random(1)
+    points = [(records[i]["lat"], records[i]["long"]) for i in rng.sample(range(N_AIRPORTS), N_QUERIES)]
+
+    # Sanity check against a linear scan
+    lat, lon = points[0]
+    brute = np.argsort(haversine_nm(lat, lon, index.lat, index.lon))[:10]
+    assert [r["ident"] for r in index.nearest(lat, lon, 10)] == [records[i]["ident"] for i in brute]
+
+    time_queries("linear scan nearest(k=5)", lambda lat, lon: np.argsort(haversine_nm(lat, lon, index.lat, index.lon))[:5], points[:200])
+    time_queries("nearest(k=5)", lambda lat, lon: index.nearest(lat, lon, 5), points)
+    time_queries("nearest(k=5, metar_only)", lambda lat, lon: index.nearest(lat, lon, 5, metar_only=True), points)
+    time_queries("within_radius(50nm)", lambda lat, lon: index.within_radius(lat, lon, 50), points)
+    time_queries("within_radius(50nm, metar_only)", lambda lat, lon: index.within_radius(lat, lon, 50, metar_only=True), points)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Month x local hour climatology tables per station, precomputed from stored history (see history.py). 
+Tables are persisted as compressed numpy archives so the board can show what's typical for this hour with an O(1) 
+lookup, without touching raw history at request time.
+"""
+
+import os
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from config import config
+
+from metar_fields import FLIGHT_RULES_REQUIREMENTS
+from history import iem_station_id
+
+PERCENTILES = [10, 25, 50, 75, 90]
+FLIGHT_CATEGORIES = [rule for _, _, rule in FLIGHT_RULES_REQUIREMENTS]
+
+# Fields with percentile tables, each shape (12 months, 24 local hours, len(PERCENTILES))
+PERCENTILE_FIELDS = ["wind_speed", "wind_peak", "crosswind", "cloud_ceiling_ft", "visibility_sm"]
+
+def climatology_fp(station: str):
+    return os.path.join(config["climatology_fp"], f"{station}.npz")
+
+def _station_tz(station: str):
+    """Station timezone from the AZOS station info if available, otherwise UTC"""
+    import airport_store
+    record = airport_store.lookup(station, sources=("azos",))
+    return (record and record["tzname"]) or "UTC"
+
+def _flight_category_codes(ceiling, visibility):
+    """Vectorized overall flight category as an index into FLIGHT_CATEGORIES, -1 if unknown"""
+    codes = np.full(ceiling.shape, -1)
+    for i, (ceiling_thresh, vx_thresh, _) in reversed(list(enumerate(FLIGHT_RULES_REQUIREMENTS))):
+        codes = np.where((ceiling <= ceiling_thresh) | (visibility <= vx_thresh), i, codes)
+    return codes
+
+def _month_hour_index(df):
+    return (df["month"].to_numpy() - 1, df["hour"].to_numpy())
+
+def _count_table(df, mask=None):
+    table = np.zeros((12, 24), dtype=np.int32)
+    sub = df if mask is None else df[mask]
+    np.add.at(table, _month_hour_index(sub), 1)
+    return table
+
+class _MonthHourAccumulator:
+    """
+    Month x hour tables accumulated one block of history at a time. 
+    Counts are summed as blocks come in, but exact percentiles need every value, so the (cell, value) pairs of each 
+    percentile field are kept for the whole history (~10 bytes per observation per field) until tables() is called. 
+    Only the full width dataframes & per runway wind arrays are bounded by the block size. 
+    """
+    def __init__(self):
+        self.n_obs = np.zeros((12, 24), dtype=np.int32)
+        self.gust_count = np.zeros((12, 24), dtype=np.int32)
+        self.flight_category_count = np.zeros((12, 24, len(FLIGHT_CATEGORIES)), dtype=np.int32)
+        self._cells = {f: [] for f in PERCENTILE_FIELDS}
+        self._values = {f: [] for f in PERCENTILE_FIELDS}
+
+    def add(self, df):
+        self.n_obs += _count_table(df)
+        self.gust_count += _count_table(df, df["wind_gust"].notna().to_numpy())
+        categories = _flight_category_codes(df["cloud_ceiling_ft"].to_numpy(), df["visibility_sm"].to_numpy())
+        for i in range(len(FLIGHT_CATEGORIES)):
+            self.flight_category_count[:, :, i] += _count_table(df, categories == i)
+        cells = (df["month"].to_numpy() - 1) * 24 + df["hour"].to_numpy()
+        for f in PERCENTILE_FIELDS:
+            values = df[f].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            self._cells[f].append(cells[valid].astype(np.int16))
+            self._values[f].append(values[valid])
+
+    def _percentile_table(self, field):
+        table = np.full((12 * 24, len(PERCENTILES)), np.nan, dtype=np.float32)
+        cells = np.concatenate(self._cells[field]) if self._cells[field] else np.empty(0, dtype=np.int16)
+        values = np.concatenate(self._values[field]) if self._values[field] else np.empty(0)
+        order = np.argsort(cells, kind="stable")
+        cells, values = cells[order], values[order]
+        bounds = np.searchsorted(cells, np.arange(12 * 24 + 1))
+        for cell in range(12 * 24):
+            if bounds[cell] < bounds[cell + 1]:
+                # Linear interpolation, same as pandas' quantile
+                table[cell] = np.quantile(values[bounds[cell]:bounds[cell + 1]], [p / 100 for p in PERCENTILES])
+        return table.reshape(12, 24, len(PERCENTILES))
+
+    def tables(self):
+        tables = {f: self._percentile_table(f) for f in PERCENTILE_FIELDS}
+        tables["n_obs"] = self.n_obs
+        tables["gust_count"] = self.gust_count
+        tables["flight_category_count"] = self.flight_category_count
+        return tables
+
+def build_climatology(airport, years: list=None, tz: str=None):
+    """
+    Compute & persist the climatology tables for an airport from its stored history, returns the Climatology. 
+    History is read one year partition & processed one chunk_rows block at a time, see _MonthHourAccumulator for what's kept. 
+    """
+    import pandas as pd
+    from history import read_fields, stored_years, CONFIG as HISTORY_CONFIG
+    from runway_wind import compute_airport_winds
+
+    station = iem_station_id(airport.icao_code or airport.ident)
+    tz = tz or _station_tz(station)
+    years = stored_years(station) if years is None else [y for y in years if y in stored_years(station)]
+    chunk_rows = HISTORY_CONFIG["chunk_rows"]
+
+    acc = _MonthHourAccumulator()
+    for year in years:
+        year_df = read_fields(station, years=[year])
+        for start in range(0, len(year_df), chunk_rows):
+            df = year_df.iloc[start:start + chunk_rows].copy()
+            local = pd.to_datetime(df["valid"], utc=True).dt.tz_convert(tz)
+            df["month"] = local.dt.month.to_numpy()
+            df["hour"] = local.dt.hour.to_numpy()
+
+            df["wind_peak"] = df["wind_gust"].fillna(df["wind_speed"])
+            winds = compute_airport_winds(airport, df["wind_direction"], df["wind_speed"], gust=df["wind_gust"],
+                                          min_variation=df["wind_min_variation"], max_variation=df["wind_max_variation"])
+            df["crosswind"] = np.maximum(np.abs(winds["min_crosswind"]), np.abs(winds["max_crosswind"]))
+            del winds
+            acc.add(df)
+        del year_df
+
+    tables = acc.tables()
+    os.makedirs(config["climatology_fp"], exist_ok=True)
+    np.savez_compressed(climatology_fp(station), tz=np.array(tz), **tables)
+    clim = Climatology(station, tz, tables)
+    with _CLIMATOLOGIES_LOCK:
+        _CLIMATOLOGIES[station] = clim
+    return clim
+
+class Climatology:
+    """Loaded month x local hour tables for a station"""
+    def __init__(self, station: str, tz: str, tables: dict):
+        self.station = station
+        self.tz = tz
+        self.tables = tables
+
+    @classmethod
+    def load(cls, station: str):
+        fp = climatology_fp(station)
+        if not os.path.isfile(fp):
+            return None
+        with np.load(fp) as npz:
+            tables = {k: npz[k] for k in npz.files if k != "tz"}
+            tz = str(npz["tz"])
+        return cls(station, tz, tables)
+
+    def typical(self, month: int, hour: int):
+        """Typical conditions for a month (1-12) & local hour (0-23), None if there are no observations"""
+        m, h = month - 1, hour
+        n_obs = int(self.tables["n_obs"][m, h])
+        if n_obs == 0:
+            return None
+        typical = {f: dict(zip([f"p{p}" for p in PERCENTILES], self.tables[f][m, h].tolist())) for f in PERCENTILE_FIELDS}
+        typical["n_obs"] = n_obs
+        typical["gust_frequency"] = float(self.tables["gust_count"][m, h]) / n_obs
+        typical["flight_category_frequency"] = dict(zip(FLIGHT_CATEGORIES, (self.tables["flight_category_count"][m, h] / n_obs).tolist()))
+        return typical
+
+    def typical_now(self):
+        now = datetime.now(ZoneInfo(self.tz))
+        return self.typical(now.month, now.hour)
+
+# Loaded climatologies by station, None if there isn't one on disk
+_CLIMATOLOGIES = dict()
+_CLIMATOLOGIES_LOCK = threading.Lock()
+
+def get_climatology(icao_like_id: str):
+    station = iem_station_id(icao_like_id)
+    with _CLIMATOLOGIES_LOCK:
+        if station not in _CLIMATOLOGIES:
+            _CLIMATOLOGIES[station] = Climatology.load(station)
+        return _CLIMATOLOGIES[station]
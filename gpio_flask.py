@@ -1,41 +1,131 @@
 """Helper functions to manage GPIO state & transmit via socket"""
 
+from collections import deque
 from gpiozero import LED, Button
 from config import config
 import json
+import threading
 import time
 
 CONFIG = config["gpio"]
 
 class FlaskGPIOManager:
+    """
+    GPIO state shared between gpiozero callback threads & socket threads. 
+    Changes are pushed to clients as sequence numbered deltas as soon as callbacks fire, with bursts coalesced. 
+    """
     # TODO implement fully no code configurable manager
     # should include support for arbitrary variables that aren't GPIO (live state)
     def __init__(self):
         self.button = Button(CONFIG["button_pin"])
         self.led = LED(CONFIG["led_pin"])
-
-        # Configure button callback
-        self.button.when_pressed = self.on_button_pressed
+        self.debug = False
 
         self._gpio_state = {
             "button": False,
+            "button_presses": 0,
             "led": True
         }
+        # Reentrant so compound updates can hold it across _update
+        self._cond = threading.Condition(threading.RLock())
+        self._seq = 0
+        # Seq each key last changed at, so each client gets exactly the keys changed since its last message
+        self._changed_seq = {k: 0 for k in self._gpio_state.keys()}
+        # Wall time of each recent change by seq, deltas carry the earliest for press to client latency
+        self._event_times = dict()
+        self._latencies_s = deque(maxlen=CONFIG["latency_samples"])
+
+        # Configure button callbacks
+        self.button.when_pressed = self.on_button_pressed
+        self.button.when_released = self.on_button_released
+
+    def _update(self, **changes):
+        """Apply changes & wake all senders, called from gpiozero & socket threads"""
+        t = time.time()
+        with self._cond:
+            self._seq += 1
+            for k, v in changes.items():
+                self._gpio_state[k] = v
+                self._changed_seq[k] = self._seq
+            self._event_times[self._seq] = t
+            while len(self._event_times) > CONFIG["latency_samples"]:
+                del self._event_times[next(iter(self._event_times))]
+            self._cond.notify_all()
 
     def on_button_pressed(self):
-        self._gpio_state["button"] = True
+        # Count presses so a press & release coalesced into one delta isn't lost
+        with self._cond:
+            self._update(button=True, button_presses=self._gpio_state["button_presses"] + 1)
+
+    def on_button_released(self):
+        self._update(button=False)
+
+    def _state_message(self):
+        return {"type": "gpio_state", "seq": self._seq, "state": dict(self._gpio_state), "debug": self.debug, "time": time.time()}
+
+    def _delta_message(self, since_seq):
+        changes = {k: self._gpio_state[k] for k, seq in self._changed_seq.items() if seq > since_seq}
+        # Earliest change in the delta, what latency is measured from
+        event_time = min((t for seq, t in self._event_times.items() if seq > since_seq), default=None)
+        return {"type": "gpio", "seq": self._seq, "changes": changes, "event_time": event_time, "time": time.time()}
 
     def send_gpio_state(self, ws, debug):
-        self._gpio_state["time"] = time.time()
-        ws.send(self._gpio_state)
-        self._gpio_state["button"] = False
+        """Send the full state, the first message on a connection"""
+        with self._cond:
+            message = self._state_message()
+        ws.send(json.dumps(message))
+        return message["seq"]
+
+    def stream_gpio_events(self, ws, debug, connected=lambda: True):
+        """Push deltas to a socket as changes happen, with heartbeats while idle, blocks while connected"""
+        seq = self.send_gpio_state(ws, debug)
+        coalesce_s = CONFIG["coalesce_ms"] / 1000
+        while connected():
+            with self._cond:
+                changed = self._cond.wait_for(lambda: self._seq > seq, timeout=CONFIG["heartbeat_s"])
+                if not changed:
+                    message = {"type": "heartbeat", "seq": self._seq, "time": time.time()}
+            # Send outside the lock so a slow client doesn't hold up GPIO callbacks & other sockets
+            if not changed:
+                ws.send(json.dumps(message))
+                continue
+            # Let a burst of changes (ex. switch bounce, press & release) land in one delta
+            time.sleep(coalesce_s)
+            with self._cond:
+                message = self._delta_message(seq)
+                seq = message["seq"]
+            ws.send(json.dumps(message))
 
     def read_client_commands(self, client_commands):
         c = json.loads(client_commands)
-        if c["led"]:
-            self.led.on()
-        else:
-            self.led.off()
-        self._gpio_state["led"] = c["led"]
+        if c.get("ack_event_time") is not None:
+            self._record_ack(c["ack_event_time"])
+        if "led" not in c:
+            return
+        with self._cond:
+            if c["led"] != self._gpio_state["led"]:
+                if c["led"]:
+                    self.led.on()
+                else:
+                    self.led.off()
+                self._update(led=c["led"])
+
+    def _record_ack(self, event_time):
+        """Time from a GPIO event to the client's ack of the delta that carried it, both on the server clock"""
+        latency = time.time() - event_time
+        with self._cond:
+            self._latencies_s.append(latency)
+
+    def latency_stats(self):
+        with self._cond:
+            latencies = sorted(self._latencies_s)
+        if not latencies:
+            return {"samples": 0}
+        return {
+            "samples": len(latencies),
+            "p50_ms": latencies[len(latencies) // 2] * 1000,
+            "p95_ms": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000,
+            "max_ms": latencies[-1] * 1000
+        }
 
-flask_gpio_manager = FlaskGPIOManager()
\ No newline at end of file
+flask_gpio_manager = FlaskGPIOManager()
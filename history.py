@@ -0,0 +1,408 @@
+"""
+Historical observations from the IEM ASOS archive (https://mesonet.agron.iastate.edu/request/download.phtml). 
+Downloads are streamed & parsed in bounded chunks, then stored as parquet files partitioned by station & year, 
+so peak memory doesn't depend on how many years are ingested. 
+pandas & pyarrow are imported lazily since only the historical routes need them.
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from config import config
+
+import upstream
+from utils import coalesce
+
+CONFIG = config["history"]
+
+def iem_station_id(icao_like_id: str):
+    """IEM uses local & UPPER CASE ids for US stations, ex. SCK NOT sck or ksck or KSCK"""
+    icao_like_id = icao_like_id.upper()
+    if icao_like_id.startswith("K") and len(icao_like_id) == 4:
+        return icao_like_id[1:]
+    return icao_like_id
+
+def station_dir(station: str):
+    return os.path.join(config["history_fp"], station)
+
+def partition_fp(station: str, year: int):
+    return os.path.join(station_dir(station), f"{year}.parquet")
+
+def stored_years(station: str):
+    d = station_dir(station)
+    if not os.path.isdir(d):
+        return []
+    return sorted(int(fn.split(".")[0]) for fn in os.listdir(d) if fn.endswith(".parquet"))
+
+def _iem_params(station: str, start: date, end: date):
+    """asos.py query, end date is exclusive"""
+    params = [
+        ("station", station),
+        ("data", "all"),
+        ("year1", start.year), ("month1", start.month), ("day1", start.day),
+        ("year2", end.year), ("month2", end.month), ("day2", end.day),
+        ("tz", "Etc/UTC"),
+        ("format", "onlycomma"),
+        ("latlon", "no"),
+        ("elev", "no"),
+        ("missing", "M"),
+        ("trace", "T"),
+        ("direct", "no"),
+    ]
+    return params + [("report_type", r) for r in CONFIG["report_types"]]
+
+class _PartitionWriter:
+    """
+    Writes chunks to per-year parquet files, keeping only the current year's file open since IEM data is chronological. 
+    With merge set, each finished year is merged into the existing partition instead of replacing it.
+    """
+    def __init__(self, station: str, merge: bool=False):
+        self.station = station
+        self.merge = merge
+        self._year = None
+        self._writer = None
+        self._tmp_fp = None
+        self.written_years = []
+
+    def write(self, df):
+        import pyarrow as pa
+        for year, year_df in df.groupby(df["valid"].str[:4].astype(int), sort=True):
+            if year != self._year:
+                self._close_current()
+                self._year = year
+                self._tmp_fp = partition_fp(self.station, year) + ".tmp"
+            table = pa.Table.from_pandas(year_df, preserve_index=False)
+            if self._writer is None:
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self._tmp_fp, table.schema, compression=CONFIG["compression"])
+            self._writer.write_table(table)
+
+    def _close_current(self):
+        if self._writer is not None:
+            self._writer.close()
+            fp = partition_fp(self.station, self._year)
+            if self.merge and os.path.isfile(fp):
+                _merge_partition(self._tmp_fp, fp)
+            # Only replace the partition once it's fully written
+            os.replace(self._tmp_fp, fp)
+            self.written_years.append(self._year)
+        self._writer = None
+
+    def close(self):
+        self._close_current()
+
+    def abort(self):
+        """Drop the partially written year, leaving the existing partition untouched"""
+        if self._writer is not None:
+            self._writer.close()
+            os.remove(self._tmp_fp)
+        self._writer = None
+
+def _merge_partition(new_fp: str, existing_fp: str):
+    """Merge an existing partition into a newly downloaded one (in place), deduplicating overlapping observations"""
+    import pandas as pd
+    df = pd.concat([pd.read_parquet(existing_fp), pd.read_parquet(new_fp)], ignore_index=True)
+    df = df.drop_duplicates(subset=["valid", "metar"], keep="last").sort_values("valid", kind="stable")
+    df.to_parquet(new_fp, index=False, compression=CONFIG["compression"])
+
+def _parse_chunk(header: str, lines: list):
+    import pandas as pd
+    # Keep everything as strings so every chunk & partition has the same schema, typed on read
+    return pd.read_csv(StringIO("\n".join([header] + lines)), dtype=str, keep_default_na=False)
+
+def ingest_history(icao_like_id: str, start: date, end: date, merge: bool=False):
+    """
+    Stream IEM ASOS observations for [start, end) into the station's year partitions. 
+    Years in the range are overwritten with what was downloaded, or merged into if merge is set. Returns the years written.
+    """
+    station = iem_station_id(icao_like_id)
+    os.makedirs(station_dir(station), exist_ok=True)
+    chunk_rows = CONFIG["chunk_rows"]
+
+    writer = _PartitionWriter(station, merge=merge)
+    header = None
+    lines = []
+    n_rows = 0
+    try:
+        with upstream.stream(CONFIG["iem_asos_url"], params=_iem_params(station, start, end)) as response:
+            for line in response.iter_lines():
+                if not line or line.startswith("#"):
+                    continue
+                if header is None:
+                    header = line
+                    continue
+                lines.append(line)
+                if len(lines) >= chunk_rows:
+                    writer.write(_parse_chunk(header, lines))
+                    n_rows += len(lines)
+                    lines = []
+        if lines:
+            writer.write(_parse_chunk(header, lines))
+            n_rows += len(lines)
+    except:
+        writer.abort()
+        raise
+    writer.close()
+    print(f"Ingested {n_rows} rows for {station} into years {writer.written_years}")
+    return writer.written_years
+
+def _manifest_fp(station: str):
+    return os.path.join(station_dir(station), "manifest.json")
+
+def load_stored_ranges(station: str):
+    """Complete [start, end) date ranges already stored for a station"""
+    fp = _manifest_fp(station)
+    if not os.path.isfile(fp):
+        return []
+    with open(fp) as f:
+        return [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in json.load(f)["ranges"]]
+
+def _save_stored_ranges(station: str, ranges: list):
+    with open(_manifest_fp(station), "w") as f:
+        json.dump({"ranges": [[s.isoformat(), e.isoformat()] for s, e in _merge_ranges(ranges)]}, f)
+
+def _merge_ranges(ranges: list):
+    merged = []
+    for s, e in sorted(ranges):
+        if merged and s <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+        else:
+            merged.append((s, e))
+    return merged
+
+def missing_ranges(stored: list, start: date, end: date):
+    """Parts of [start, end) not covered by the stored ranges"""
+    missing = []
+    cursor = start
+    for s, e in _merge_ranges(stored):
+        if e <= cursor:
+            continue
+        if s >= end:
+            break
+        if s > cursor:
+            missing.append((cursor, s))
+        cursor = max(cursor, e)
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+def update_history(icao_like_id: str, start: date=None, end: date=None):
+    """
+    Incrementally bring a station's history up to date, only downloading date ranges that aren't stored yet. 
+    Today is never recorded as complete, so it's re-fetched (& deduplicated) on the next run. 
+    Returns the years whose partitions changed.
+    """
+    station = iem_station_id(icao_like_id)
+    start = coalesce(start, date.fromisoformat(CONFIG["start_date"]))
+    today = date.today()
+    end = coalesce(end, today + timedelta(days=1))
+
+    stored = load_stored_ranges(station)
+    changed_years = set()
+    for s, e in missing_ranges(stored, start, end):
+        print(f"Fetching {station} history for {s} - {e}")
+        changed_years.update(ingest_history(station, s, e, merge=True))
+        # Ranges are recorded as they complete so an interrupted update resumes where it left off
+        stored.append((s, min(e, today)))
+        _save_stored_ranges(station, [r for r in stored if r[0] < r[1]])
+    for year in changed_years:
+        update_fields_partition(station, year)
+    return sorted(changed_years)
+
+def fields_partition_fp(station: str, year: int):
+    return os.path.join(station_dir(station), "fields", f"{year}.parquet")
+
+def update_fields_partition(station: str, year: int):
+    """(Re)compute the extracted METAR fields for one year partition, so unchanged years are never re-extracted"""
+    import pandas as pd
+    df = pd.read_parquet(partition_fp(station, year), columns=["valid", "metar"])
+    fields = extract_metar_fields(df["metar"])
+    fields.insert(0, "valid", df["valid"].to_numpy())
+    os.makedirs(os.path.dirname(fields_partition_fp(station, year)), exist_ok=True)
+    fields.to_parquet(fields_partition_fp(station, year), index=False, compression=CONFIG["compression"])
+
+def read_fields(icao_like_id: str, years: list=None):
+    """Load extracted METAR fields (see PARSED_METAR_FIELDS) & observation time for a station, computing missing years"""
+    import pandas as pd
+    station = iem_station_id(icao_like_id)
+    years = stored_years(station) if years is None else [y for y in years if y in stored_years(station)]
+    for y in years:
+        fp = fields_partition_fp(station, y)
+        if (not os.path.isfile(fp)) or os.path.getmtime(fp) < os.path.getmtime(partition_fp(station, y)):
+            update_fields_partition(station, y)
+    if not years:
+        return pd.DataFrame(columns=["valid"] + PARSED_METAR_FIELDS)
+    return pd.concat([pd.read_parquet(fields_partition_fp(station, y)) for y in years], ignore_index=True)
+
+def read_history(icao_like_id: str, years: list=None, columns: list=None):
+    """Load stored observations for a station as a dataframe, optionally only some years & columns"""
+    import pandas as pd
+    station = iem_station_id(icao_like_id)
+    years = stored_years(station) if years is None else [y for y in years if y in stored_years(station)]
+    if not years:
+        return pd.DataFrame(columns=columns)
+    return pd.concat([pd.read_parquet(partition_fp(station, y), columns=columns) for y in years], ignore_index=True)
+
+# Compact fields returned by parsing workers, instead of pickling full Metar objects back to the parent
+PARSED_METAR_FIELDS = [
+    "wind_direction",           # NaN for VRB
+    "wind_speed",
+    "wind_gust",
+    "wind_min_variation",
+    "wind_max_variation",
+    "visibility_sm",
+    "cloud_ceiling_ft",
+    "vertical_visibility_ft",
+    "altimeter_mb",
+    "temperature_c",
+    "dew_point_c",
+]
+_NAN_ROW = tuple(float("nan") for _ in PARSED_METAR_FIELDS)
+
+# One parser per worker process, set by the pool initializer
+_worker_parser = None
+
+def _init_parse_worker():
+    global _worker_parser
+    from metar_taf_parser.parser.parser import MetarParser
+    _worker_parser = MetarParser()
+
+def _nan_if_none(v):
+    return float("nan") if v is None else v
+
+def _metar_to_fields(metar):
+    from metar_fields import compute_cloud_ceiling, parse_visibility
+    wind = metar.wind
+    return (
+        float("nan") if wind is None or wind.direction == "VRB" else _nan_if_none(wind.degrees),
+        float("nan") if wind is None else _nan_if_none(wind.speed),
+        float("nan") if wind is None else _nan_if_none(wind.gust),
+        float("nan") if wind is None else _nan_if_none(wind.min_variation),
+        float("nan") if wind is None else _nan_if_none(wind.max_variation),
+        float("nan") if metar.visibility is None else parse_visibility(metar.visibility.distance),
+        compute_cloud_ceiling(metar),
+        _nan_if_none(metar.vertical_visibility),
+        _nan_if_none(metar.altimeter),
+        _nan_if_none(metar.temperature),
+        _nan_if_none(metar.dew_point),
+    )
+
+def _parse_metar_shard(metar_texts: list):
+    rows = []
+    for metar_text in metar_texts:
+        try:
+            rows.append(_metar_to_fields(_worker_parser.parse(metar_text)))
+        except Exception:
+            rows.append(_NAN_ROW)
+    return rows
+
+def parse_metars_parallel(metar_texts, n_workers: int=None, shard_rows: int=None):
+    """
+    Parse raw METAR strings across a process pool into a dataframe of PARSED_METAR_FIELDS (same order as the input). 
+    Rows that fail to parse are all NaN, fewer than shard_rows are parsed in process. Prints throughput in rows/sec.
+    """
+    import pandas as pd
+    metar_texts = list(metar_texts)
+    shard_rows = coalesce(shard_rows, CONFIG["parse_shard_rows"])
+    shards = [metar_texts[i:i + shard_rows] for i in range(0, len(metar_texts), shard_rows)]
+    # A pool costs more to start than a single shard takes to parse
+    n_workers = min(coalesce(n_workers, CONFIG["parse_workers"], os.cpu_count()), max(len(shards), 1))
+
+    st = time.time()
+    rows = []
+    if n_workers <= 1:
+        _init_parse_worker()
+        for shard in shards:
+            rows.extend(_parse_metar_shard(shard))
+    else:
+        # Spawned, not forked, workers don't inherit the Flask app's threads & locks
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_parse_worker, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for shard_rows_parsed in pool.map(_parse_metar_shard, shards):
+                rows.extend(shard_rows_parsed)
+    dt = time.time() - st
+    print(f"Parsed {len(rows)} METARs in {dt:.1f}s ({len(rows) / max(dt, 1e-9):.0f} rows/sec) using {n_workers} workers")
+    return pd.DataFrame.from_records(rows, columns=PARSED_METAR_FIELDS)
+
+def _to_float(series):
+    import pandas as pd
+    return pd.to_numeric(series, errors="coerce")
+
+def _signed_temperature(series):
+    return _to_float(series.str.replace("M", "-", regex=False))
+
+def extract_metar_fields(metar_texts, fallback: bool=True):
+    """
+    Extract PARSED_METAR_FIELDS straight from raw METAR text with vectorized string operations, skipping full parsing. 
+    Rows that can't be decoded this way (ex. missing wind groups, M/P visibility, '///' sky groups) fall back to 
+    parse_metars_parallel if fallback is set, otherwise are left as NaN. Returns a dataframe in the input order.
+    """
+    import numpy as np
+    import pandas as pd
+    from metar_fields import NO_CEILING_FT
+
+    texts = pd.Series(metar_texts, dtype=str).reset_index(drop=True)
+    # Pad with spaces so groups can be matched as whole tokens, ignoring remarks
+    body = " " + texts.str.split(" RMK", n=1).str[0] + " "
+    out = pd.DataFrame(index=texts.index, columns=PARSED_METAR_FIELDS, dtype=float)
+
+    # Wind, ex. 29012G20KT / VRB03KT, & variation 260V320
+    wind = body.str.extract(r" (\d{3}|VRB)(\d{2,3})(?:G(\d{2,3}))?KT ")
+    out["wind_direction"] = _to_float(wind[0])
+    out["wind_speed"] = _to_float(wind[1])
+    out["wind_gust"] = _to_float(wind[2])
+    variation = body.str.extract(r" (\d{3})V(\d{3}) ")
+    out["wind_min_variation"] = _to_float(variation[0])
+    out["wind_max_variation"] = _to_float(variation[1])
+
+    # Statute mile visibility, ex. 10SM / 1 1/2SM / 1/2SM
+    vis = body.str.extract(r" (?:(\d{1,2}) )?(?:(\d{1,2})/(\d{1,2})|(\d{1,2}))SM ")
+    whole = _to_float(vis[0]).fillna(0) + _to_float(vis[3]).fillna(0)
+    out["visibility_sm"] = (whole + (_to_float(vis[1]) / _to_float(vis[2])).fillna(0)).where(vis[1].notna() | vis[3].notna())
+
+    # Ceiling is the lowest broken / overcast layer or vertical visibility, see metar_fields.compute_cloud_ceiling
+    out["vertical_visibility_ft"] = _to_float(body.str.extract(r" VV(\d{3}) ")[0]) * 100
+    layers = body.str.extractall(r" (?:BKN|OVC)(\d{3})(?:CB|TCU|///)?(?= )")
+    lowest_layer = (_to_float(layers[0]) * 100).groupby(level=0).min().reindex(texts.index)
+    out["cloud_ceiling_ft"] = np.fmin(out["vertical_visibility_ft"].fillna(NO_CEILING_FT), lowest_layer)
+
+    # Altimeter in mb, truncated like the METAR parser
+    inhg = _to_float(body.str.extract(r" A(\d{4}) ")[0]) / 100
+    qnh = _to_float(body.str.extract(r" Q(\d{4}) ")[0])
+    out["altimeter_mb"] = np.trunc(33.8639 * inhg).fillna(qnh)
+
+    # The parser drops the group entirely if the dew point is missing
+    temps = body.str.extract(r" (M?\d{2})/(M?\d{2}) ")
+    out["temperature_c"] = _signed_temperature(temps[0])
+    out["dew_point_c"] = _signed_temperature(temps[1])
+
+    undecoded = wind[1].isna() | out["visibility_sm"].isna() | body.str.contains(r" (?:BKN|OVC|VV)///", regex=True)
+    out.loc[undecoded, :] = np.nan
+    if fallback and undecoded.any():
+        parsed = parse_metars_parallel(texts[undecoded])
+        parsed.index = texts.index[undecoded]
+        out.loc[undecoded, :] = parsed.values
+    print(f"Extracted {len(texts) - int(undecoded.sum())} METARs with vectorized matching, {int(undecoded.sum())} fell back to the parser")
+    return out
+
+def verify_extractor_parity(metar_texts):
+    """
+    Compare extract_metar_fields against full parsing (which uses the same metar_fields helpers as 
+    Airport._compute_cloud_ceiling & Airport._parse_visibility). Returns the rows that disagree, empty if in parity.
+    """
+    import numpy as np
+    texts = list(metar_texts)
+    extracted = extract_metar_fields(texts, fallback=False)
+    parsed = parse_metars_parallel(texts, n_workers=1)
+    decoded = extracted["wind_speed"].notna()
+    mismatched = ~np.isclose(extracted.values, parsed.values, equal_nan=True).all(axis=1) & decoded.values
+    return extracted[mismatched].join(parsed[mismatched], rsuffix="_parsed").assign(metar=[t for t, m in zip(texts, mismatched) if m])
+
+if __name__ == "__main__":
+    # Nightly update, ex. python history.py KSCK KSQL
+    import sys
+    for station in sys.argv[1:]:
+        print(f"{station}: updated years {update_history(station)}")
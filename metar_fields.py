@@ -0,0 +1,50 @@
+"""Derived METAR fields shared by live airports & bulk historical processing"""
+
+from datetime import datetime, timedelta, timezone
+from utils import coalesce
+from metar_taf_parser.model.model import Metar
+from metar_taf_parser.model.enum import CloudQuantity
+
+# Formatted as ceiling, (OR) viz, rules
+FLIGHT_RULES_REQUIREMENTS = [
+    (500, 1, "LIFR"),
+    (1000, 3, "IFR"),
+    (3000, 5, "MVFR"),
+    (100_000, 100, "VFR"),
+]
+
+# Ceiling used when there are no broken / overcast layers or vertical visibility
+NO_CEILING_FT = 10_000
+
+def compute_cloud_ceiling(metar: Metar):
+    ceiling = coalesce(metar.vertical_visibility, NO_CEILING_FT)
+    for c in metar.clouds:
+        if c.quantity in (CloudQuantity.BKN, CloudQuantity.OVC) and c.height <= ceiling:
+            ceiling = c.height
+    return ceiling
+
+def parse_visibility(s: str):
+    """Statute mile visibility string (ex. '10SM', '1 1/2SM', '1/2SM') to a float, 0 if not in statute miles"""
+    if s.endswith("SM"):
+        s = s[:-2].split(" ")
+        if len(s) == 1:
+            if "/" in s[0]:
+                f = s[0].split("/")
+                return float(f[0]) / float(f[1])
+            return float(s[0])
+        else:
+            f = s[1].split("/")
+            return float(s[0]) + float(f[0]) / float(f[1])
+    else:
+        return 0
+
+def observation_datetime(metar: Metar, now: datetime=None):
+    """UTC datetime of a report, which only has the day of month, taking the most recent matching day up to now"""
+    now = coalesce(now, datetime.now(timezone.utc))
+    d = now
+    # Walk back at most a month to the report's day (day 31 may need 2 months back, ex. early March)
+    for _ in range(62):
+        if d.day == metar.day:
+            return datetime.combine(d.date(), metar.time, tzinfo=timezone.utc)
+        d -= timedelta(days=1)
+    return None
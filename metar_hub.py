@@ -0,0 +1,129 @@
+"""
+Pub/sub of METAR updates to connected kiosks. 
+Clients subscribe to stations over a socket & are pushed a small update whenever an airport picks up a new report, 
+each update is built & serialized once per report no matter how many clients are subscribed. 
+"""
+
+import json
+import threading
+
+import airport_info as airports
+from utils import coalesce
+
+# Panels & the data they're rendered from, a panel is re-fetched by clients only if its data changed
+PANEL_FIELDS = {
+    "wind": ("wind",),
+    "additional_info": ("wind", "flight_category", "visibility_flight_category", "ceiling_flight_category", 
+                        "visibility", "cloud_ceiling", "temperature", "altimeter"),
+    "cloud_cover": (),
+}
+
+def station_id(airport):
+    return coalesce(airport.icao_code, airport.ident).upper()
+
+def observation_id(metar):
+    """Observation day & time as in the report, ex. 161756Z (None without a report)"""
+    if metar is None:
+        return None
+    return f"{metar.day:02d}{metar.time.strftime('%H%M')}Z"
+
+def _metar_data(airport):
+    metar = airport._metar
+    wind = metar.wind
+    return {
+        "raw": metar.message,
+        "observation": observation_id(metar),
+        "wind": [wind.direction if wind.direction == "VRB" else wind.degrees, wind.speed, wind.gust, wind.min_variation, wind.max_variation] if wind is not None else None,
+        "flight_category": airport._flight_category,
+        "visibility_flight_category": airport._vx_flight_category,
+        "ceiling_flight_category": airport._ceiling_flight_category,
+        "visibility": metar.visibility.distance if metar.visibility is not None else None,
+        "cloud_ceiling": airport._cloud_ceiling,
+        "temperature": [metar.temperature, metar.dew_point],
+        "altimeter": metar.altimeter,
+    }
+
+class _Client:
+    """Socket wrapper, sends may come from the refresher thread while the socket's own thread is receiving"""
+    def __init__(self, ws):
+        self.ws = ws
+        self._send_lock = threading.Lock()
+
+    def send(self, message: str):
+        with self._send_lock:
+            self.ws.send(message)
+
+class MetarHub:
+    def __init__(self):
+        # Clients by station & last published data by station
+        self._subscribers = dict()
+        self._clients = dict()
+        self._last_data = dict()
+        self._lock = threading.Lock()
+
+    def _client(self, ws):
+        with self._lock:
+            if id(ws) not in self._clients:
+                self._clients[id(ws)] = _Client(ws)
+            return self._clients[id(ws)]
+
+    def send(self, ws, message: dict):
+        """Send directly to one socket, serialized with any concurrent publishes"""
+        self._client(ws).send(json.dumps(message))
+
+    def subscribe(self, ws, airport):
+        """Subscribe a socket to an airport's updates, immediately sending it the current state"""
+        station = station_id(airport)
+        client = self._client(ws)
+        with self._lock:
+            self._subscribers.setdefault(station, set()).add(client)
+        if airport._metar is not None:
+            data = _metar_data(airport)
+            with self._lock:
+                self._last_data.setdefault(station, data)
+            client.send(json.dumps({"type": "metar", "station": station, "stale": airport.metar_is_stale, 
+                                    "changed": list(PANEL_FIELDS.keys()), **data}))
+        return station
+
+    def unsubscribe(self, ws, station: str):
+        with self._lock:
+            client = self._clients.get(id(ws))
+            subscribers = self._subscribers.get(station.upper())
+            if client is not None and subscribers is not None:
+                subscribers.discard(client)
+
+    def remove(self, ws):
+        """Drop a socket from all stations, ex. once it's closed"""
+        with self._lock:
+            client = self._clients.pop(id(ws), None)
+            for subscribers in self._subscribers.values():
+                subscribers.discard(client)
+
+    def subscriber_count(self, station: str=None):
+        with self._lock:
+            if station is not None:
+                return len(self._subscribers.get(station.upper(), ()))
+            return len(self._clients)
+
+    def publish(self, airport):
+        """New METAR listener, fans the update out to every subscriber of the station"""
+        station = station_id(airport)
+        data = _metar_data(airport)
+        with self._lock:
+            previous = self._last_data.get(station)
+            self._last_data[station] = data
+            clients = list(self._subscribers.get(station, ()))
+        if not clients:
+            return
+        changed = [panel for panel, fields in PANEL_FIELDS.items() 
+                   if previous is None or any(previous[f] != data[f] for f in fields)]
+        message = json.dumps({"type": "metar", "station": station, "stale": False, "changed": changed, **data})
+        for client in clients:
+            try:
+                client.send(message)
+            except Exception:
+                # Closed socket, its handler will remove it
+                pass
+
+metar_hub = MetarHub()
+airports.add_new_metar_listener(metar_hub.publish)
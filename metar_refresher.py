@@ -0,0 +1,124 @@
+"""Background refresh of METARs & TAFs for watched airports, so request handling only reads from memory"""
+
+import asyncio
+import threading
+import time
+from config import config
+
+import airport_info as airports
+
+CONFIG = config["metar_refresh"]
+
+class MetarRefresher:
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+
+        # Watched ICAO-like codes & when each was last requested. 
+        # Only pinned (configured board) airports are pinned in the airport cache, others are unwatched once idle or evicted
+        self._watched = dict()
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._watch_configured = True
+
+        # True while a batched refresh is in flight
+        self.refreshing = False
+        self.last_refresh_time = None
+
+    def watch(self, icao_like_code: str, pin: bool=False):
+        """
+        Keep an airport warm in the background, returns the airport (or None if unknown). 
+        Pinned airports are kept until unwatched, others until idle for idle_unwatch_s with no hub subscribers. 
+        """
+        icao_like_code = icao_like_code.upper()
+        with self._lock:
+            if icao_like_code in self._watched:
+                airport = airports.AIRPORT_CACHE.peek(icao_like_code)
+                if airport is not None:
+                    self._watched[icao_like_code] = time.time()
+                    if pin:
+                        self._pinned.add(icao_like_code)
+                        airports.AIRPORT_CACHE.pin(icao_like_code)
+                    return airport
+        # Cold loads fetch airport info, METAR, & TAF concurrently
+        airport = asyncio.run(airports.get_airport_info_async(icao_like_code))
+        if airport is None:
+            return None
+        airport.background_refresh = True
+        with self._lock:
+            self._watched[icao_like_code] = time.time()
+            if pin:
+                self._pinned.add(icao_like_code)
+                airports.AIRPORT_CACHE.pin(icao_like_code)
+        return airport
+
+    def unwatch(self, icao_like_code: str):
+        icao_like_code = icao_like_code.upper()
+        with self._lock:
+            if icao_like_code not in self._watched:
+                return
+            del self._watched[icao_like_code]
+            airport = airports.AIRPORT_CACHE.peek(icao_like_code)
+            if icao_like_code in self._pinned:
+                self._pinned.discard(icao_like_code)
+                airports.AIRPORT_CACHE.unpin(icao_like_code)
+        if airport is not None:
+            airport.background_refresh = False
+
+    def get_watched(self):
+        """Watched airports, as currently cached (a bypassing refetch may have replaced them)"""
+        with self._lock:
+            watched = [airports.AIRPORT_CACHE.peek(icao) for icao in self._watched]
+        return [a for a in watched if a is not None]
+    watched = property(get_watched)
+
+    def refresh_now(self):
+        """Wake the refresher thread to refresh immediately instead of waiting for the next interval"""
+        self._wake.set()
+
+    def start(self, watch_configured: bool=True):
+        """Start the refresher thread, watching the configured airports from within it so startup isn't blocked"""
+        if self._thread is None:
+            self._watch_configured = watch_configured
+            self._thread = threading.Thread(target=self._run, name="metar_refresher", daemon=True)
+            self._thread.start()
+
+    def _unwatch_idle(self):
+        """Unwatch unpinned airports evicted from the airport cache, or idle with no hub subscribers"""
+        from metar_hub import metar_hub, station_id
+        t = time.time()
+        with self._lock:
+            candidates = [(icao, airports.AIRPORT_CACHE.peek(icao)) for icao, last_watched in self._watched.items() 
+                          if icao not in self._pinned and t - last_watched > CONFIG["idle_unwatch_s"]]
+            candidates += [(icao, None) for icao in self._watched.keys() 
+                           if icao not in self._pinned and icao not in airports.AIRPORT_CACHE]
+        for icao, airport in candidates:
+            if airport is None or metar_hub.subscriber_count(station_id(airport)) == 0:
+                self.unwatch(icao)
+
+    def _refresh(self):
+        self._unwatch_idle()
+        watched = self.watched
+        if not watched:
+            return
+        self.refreshing = True
+        try:
+            airports.refresh_airports(watched, include_taf=True, check_cache=False)
+            self.last_refresh_time = time.time()
+        except Exception as e:
+            # Keep serving stale data, try again next interval
+            print(f"Background METAR refresh failed: {e}")
+        finally:
+            self.refreshing = False
+
+    def _run(self):
+        if self._watch_configured:
+            for icao in CONFIG["watched_icaos"]:
+                self.watch(icao, pin=True)
+        while True:
+            self._refresh()
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+
+metar_refresher = MetarRefresher(CONFIG["interval_s"])
@@ -4,16 +4,30 @@ from utils import coalesce, mb_to_inHg
 
 from math import pi, radians, sqrt
 from io import BytesIO
+from collections import OrderedDict
+import base64
+import hashlib
+import json
+import re
+import threading
 import cairo
-from airport_info import RunwayWindInfo, Airport
+from airport_info import RunwayWindInfo, Airport, AirportSnapshot, add_new_metar_listener
 from metar_taf_parser.parser.parser import Metar
 from metar_taf_parser.model.model import Wind
+from typing_extensions import Literal
 
 RENDERING_CONFIG = config["rendering"]
 RW_CONFIG = RENDERING_CONFIG["runway"]
 ADDITIONAL_INFO_CONFIG = RENDERING_CONFIG["additional_info"]
 MINI_RW_CONFIG = ADDITIONAL_INFO_CONFIG["mini_runway"]
 
+# Short hash of the rendering config, so cached renders are never served across config changes
+RENDERING_CONFIG_HASH = hashlib.sha1(json.dumps(RENDERING_CONFIG, sort_keys=True).encode()).hexdigest()[:12]
+RENDER_CACHE_MAX_ENTRIES = config["render_cache"]["max_entries"]
+STATIC_LAYERS = config["render_cache"]["static_layers"]
+LAYER_CACHE_MAX_ENTRIES = config["render_cache"]["max_layers"]
+DEFAULT_FORMAT = config["render_cache"]["default_format"]
+
 N_MAJOR_SEGMENTS = 12
 N_MINOR_SEGMENTS = 72
 
@@ -33,6 +47,12 @@ for wsi in range(1, 100):
     for c in ADDITIONAL_INFO_CONFIG["crosswind_color_bands"][::-1]:
         if wsi <= c[0]:
             CROSSWIND_COLOR_MAP[wsi] = c[1:]
+# Active gauge bands can only be drawn over a pre-recorded inactive gauge if they fully cover it
+WIND_GAUGE_ACTIVE_OPAQUE = all(rgba[3] == 1 for rgba in WIND_GAUGE_ACTIVE_COLOR_MAP.values())
+
+# Pre-recorded static layers (compass, inactive gauge, runways), keyed by what they're drawn from & the config hash
+_LAYER_CACHE = OrderedDict()
+_LAYER_CACHE_LOCK = threading.Lock()
 
 def _centered_rectangle(cr: cairo.Context, x_center, y_center, width, height):
     cr.rectangle(x_center - width / 2, y_center - height / 2, width, height)
@@ -93,11 +113,12 @@ def _render_runway(cr: cairo.Context, rwi: RunwayWindInfo, background_mode: bool
 
     cr.restore()
 
-def _render_wind_compass(cr: cairo.Context, wind: Wind):
+def _render_wind_compass(cr: cairo.Context, wind: Wind, layer: Literal["all", "static", "dynamic"]="all"):
+    """The static layer is the ring & ticks, the dynamic layer is the wind pointer (drawn underneath)"""
     r = RW_CONFIG["compass_radius"]
 
     # Wind pointer
-    if wind.degrees is not None:
+    if layer != "static" and wind.degrees is not None:
         w, h = RW_CONFIG["wind_arrow_width"], RW_CONFIG["wind_arrow_height"]
         ws = min(coalesce(wind.gust, wind.speed), 45)
         scaled_w, scaled_h = sqrt(5 * ws) * w, ws * h
@@ -128,6 +149,8 @@ def _render_wind_compass(cr: cairo.Context, wind: Wind):
 
         cr.stroke()
         cr.restore()
+    if layer == "dynamic":
+        return
 
     # Circle outline - currently disabled (alpha = 0)
     cr.save()
@@ -207,13 +230,17 @@ def _render_wind_compass(cr: cairo.Context, wind: Wind):
         cr.rotate(2 * pi / N_MINOR_SEGMENTS)
     cr.restore()
 
-def _render_wind_gauge(cr: cairo.Context, wind: Wind):
+def _render_wind_gauge(cr: cairo.Context, wind: Wind, layer: Literal["all", "static", "dynamic"]="all"):
+    """
+    The static layer is every band in its inactive color, the dynamic layer is only the active bands & gust highlights. 
+    Layering is only equivalent when active colors are opaque, see WIND_GAUGE_ACTIVE_OPAQUE. 
+    """
     cr.save()
     cr.set_source_rgba(1, 0, 0, 1)
     cr.translate(0.5, 0.5)
 
-    ws = coalesce(wind.speed, 1)
-    gust = coalesce(wind.gust, ws)
+    ws = coalesce(wind.speed, 1) if layer != "static" else 0
+    gust = coalesce(wind.gust, ws) if layer != "static" else 0
     r = RW_CONFIG["compass_radius"] + RW_CONFIG["wind_gauge_radius_extension"]
     n_rectangles = N_MINOR_SEGMENTS // 2
 
@@ -222,6 +249,8 @@ def _render_wind_gauge(cr: cairo.Context, wind: Wind):
 
     # Draw rectanges in circular pattern with appropriate colors
     for wsi in range(1, n_rectangles + 1):
+        if layer == "dynamic" and wsi > gust:
+            break
         cm = WIND_GAUGE_ACTIVE_COLOR_MAP if wsi <= gust else WIND_GAUGE_INACTIVE_COLOR_MAP
         rgba = cm[wsi] if wsi in cm.keys() else (0, 0, 0, 1)
         cr.set_source_rgba(*rgba)
@@ -354,7 +383,9 @@ def _render_mini_runway_wind(cr: cairo.Context, rwi: RunwayWindInfo):
 
     # Crosswind text
     s = _format_wind_str(rwi.min_crosswind, rwi.max_crosswind)
-    cr.set_source_rgba(*CROSSWIND_COLOR_MAP[int(round(rwi.max_crosswind, 0))])
+    # Colored by crosswind strength, left crosswinds are negative & calm rounds to 0
+    crosswind = min(max(int(round(max(abs(rwi.min_crosswind), abs(rwi.max_crosswind)), 0)), 1), max(CROSSWIND_COLOR_MAP.keys()))
+    cr.set_source_rgba(*CROSSWIND_COLOR_MAP[crosswind])
     x, y, text_width, text_height, dx, dy = cr.text_extents(s)
     cr.move_to(-xws * ((base_width / 2) + text_horizontal_offset) - (text_width if xws == 1 else 0), -text_height)
     cr.text_path(s)
@@ -371,11 +402,19 @@ def _render_mini_runway_wind(cr: cairo.Context, rwi: RunwayWindInfo):
 
     cr.restore()
 
-def _setup_canvas(w, h, background_rgba=(0, 0, 0, 0)):
+def _antialias(fmt: str):
+    # Vector output is rasterized by the browser, raster output is final so it's antialiased here
+    return cairo.ANTIALIAS_GOOD if fmt == "png" else cairo.ANTIALIAS_NONE
+
+def _setup_canvas(w, h, background_rgba=(0, 0, 0, 0), fmt: Literal["svg", "png"]="svg"):
+    """SVG canvas, or for png a raster canvas at exactly w x h pixels"""
     output = BytesIO()
-    surface = cairo.SVGSurface(output, w, h)
+    if fmt == "png":
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, w, h)
+    else:
+        surface = cairo.SVGSurface(output, w, h)
     cr = cairo.Context(surface)
-    cr.set_antialias(cairo.ANTIALIAS_NONE)
+    cr.set_antialias(_antialias(fmt))
     cr.scale(w, h)
 
     # Background
@@ -387,6 +426,8 @@ def _setup_canvas(w, h, background_rgba=(0, 0, 0, 0)):
 
 def _cleanup_canvas(surface, output):
     surface.flush()
+    if isinstance(surface, cairo.ImageSurface):
+        surface.write_to_png(output)
     surface.finish()
 
     output.flush()
@@ -394,31 +435,80 @@ def _cleanup_canvas(surface, output):
 
     return output
 
-# TODO cache rendering functions by syncing this with the METAR caching
-def render_metar_wind(airport: Airport):
+def _record_layer(w, h, fmt, draw, *args, **kwargs):
+    """Record draw(cr, *args, **kwargs) on a w x h canvas once, to be replayed onto any number of renders"""
+    layer = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, cairo.Rectangle(0, 0, w, h))
+    cr = cairo.Context(layer)
+    cr.set_antialias(_antialias(fmt))
+    cr.scale(w, h)
+    draw(cr, *args, **kwargs)
+    layer.flush()
+    return layer
+
+def _get_layer(key, w, h, fmt, draw, *args, **kwargs):
+    """Recorded static layer, keyed by what it's drawn from (the output format & rendering config hash are added here)"""
+    key = (*key, fmt, RENDERING_CONFIG_HASH)
+    with _LAYER_CACHE_LOCK:
+        layer = _LAYER_CACHE.get(key)
+        if layer is not None:
+            _LAYER_CACHE.move_to_end(key)
+            return layer
+    layer = _record_layer(w, h, fmt, draw, *args, **kwargs)
+    with _LAYER_CACHE_LOCK:
+        _LAYER_CACHE[key] = layer
+        while len(_LAYER_CACHE) > LAYER_CACHE_MAX_ENTRIES:
+            _LAYER_CACHE.popitem(last=False)
+    return layer
+
+def _paint_layer(cr: cairo.Context, layer: cairo.RecordingSurface):
+    cr.save()
+    # Layers are recorded in device space
+    cr.identity_matrix()
+    cr.set_source_surface(layer, 0, 0)
+    cr.paint()
+    cr.restore()
+
+def _runway_layer(rwi: RunwayWindInfo, background_mode: bool, fmt: str):
+    """Runways only depend on their geometry & whether they're favored, not the wind"""
+    rw = rwi.runway
     w, h = RW_CONFIG["size"]
-    output, surface, cr = _setup_canvas(w, h)
+    return _get_layer(("runway", rw.le_ident, rw.he_ident, rw.le_heading_degT, background_mode), w, h, fmt, 
+                      _render_runway, rwi, background_mode=background_mode)
 
-    metar = airport.metar
-    _render_wind_gauge(cr, metar.wind)
-    _render_wind_compass(cr, metar.wind)
+def render_metar_wind(airport: Airport, static_layers: bool=None, fmt: Literal["svg", "png"]="svg"):
+    """static_layers replays the pre-recorded compass, inactive gauge & runways, drawing only the wind per render"""
+    static_layers = coalesce(static_layers, STATIC_LAYERS)
+    w, h = RW_CONFIG["size"]
+    output, surface, cr = _setup_canvas(w, h, fmt=fmt)
 
+    metar = airport.metar
     rwis = airport.runway_wind_info
-    for i, rwi in enumerate(rwis):
-        # Highlight favored runway
-        _render_runway(cr, rwi, background_mode=i > 0)
+    if static_layers and WIND_GAUGE_ACTIVE_OPAQUE:
+        # Same draw order as below, with the static parts replayed
+        _paint_layer(cr, _get_layer(("wind_gauge",), w, h, fmt, _render_wind_gauge, None, layer="static"))
+        _render_wind_gauge(cr, metar.wind, layer="dynamic")
+        _render_wind_compass(cr, metar.wind, layer="dynamic")
+        _paint_layer(cr, _get_layer(("wind_compass",), w, h, fmt, _render_wind_compass, None, layer="static"))
+        for i, rwi in enumerate(rwis):
+            _paint_layer(cr, _runway_layer(rwi, background_mode=i > 0, fmt=fmt))
+    else:
+        _render_wind_gauge(cr, metar.wind)
+        _render_wind_compass(cr, metar.wind)
+        for i, rwi in enumerate(rwis):
+            # Highlight favored runway
+            _render_runway(cr, rwi, background_mode=i > 0)
 
     _cleanup_canvas(surface, output)
 
     return output
 
-def render_metar_additional_info(airport: Airport):
+def render_metar_additional_info(airport: Airport, fmt: Literal["svg", "png"]="svg"):
     w, h = ADDITIONAL_INFO_CONFIG["size"]
     aspect_ratio = w / h
     # TODO finish & clean up this component
     # TODO cleanup metar text in an html component
 
-    output, surface, cr = _setup_canvas(w, h)
+    output, surface, cr = _setup_canvas(w, h, fmt=fmt)
 
     backsplash_color = ADDITIONAL_INFO_CONFIG["backsplash_color"]
     # Flight category backsplash
@@ -581,11 +671,111 @@ def render_metar_additional_info(airport: Airport):
 
     return output
 
+def render_no_metar(w, h, fmt: Literal["svg", "png"]="svg"):
+    """Placeholder for METAR panels while a station has no current report"""
+    output, surface, cr = _setup_canvas(w, h, fmt=fmt)
+    cr.set_source_rgba(0, 0, 0, 1)
+    _set_clearview_font(cr)
+    cr.set_font_size(0.08 * min(w, h) / h)
+    s = "NO METAR"
+    x, y, text_width, text_height, dx, dy = cr.text_extents(s)
+    cr.move_to(0.5 - (text_width / 2), 0.5 + (text_height / 2))
+    cr.show_text(s)
+    _cleanup_canvas(surface, output)
+    return output
+
 # TODO render cloud coverage
-def render_metar_cloud_cover():
+def render_metar_cloud_cover(fmt: Literal["svg", "png"]="svg"):
     w, h = 120, 480
-    output, surface, cr = _setup_canvas(w, h, background_rgba=(0, 0, 1, 1))
+    output, surface, cr = _setup_canvas(w, h, background_rgba=(0, 0, 1, 1), fmt=fmt)
 
     _cleanup_canvas(surface, output)
 
-    return output
\ No newline at end of file
+    return output
+
+# Bounded LRU cache of finished renders, keyed by (station, panel, METAR day, METAR time, format, config hash)
+_RENDER_CACHE = OrderedDict()
+_RENDER_CACHE_LOCK = threading.Lock()
+
+# Panels drawn from the METAR & their size, rendered as a placeholder when there's no current report
+METAR_PANEL_SIZES = {
+    "wind": RW_CONFIG["size"],
+    "additional_info": ADDITIONAL_INFO_CONFIG["size"],
+}
+
+# Renderers called with (airport, fmt)
+PANEL_RENDERERS = {
+    "wind": lambda airport, fmt: render_metar_wind(airport, fmt=fmt),
+    "additional_info": lambda airport, fmt: render_metar_additional_info(airport, fmt=fmt),
+    "cloud_cover": lambda airport, fmt: render_metar_cloud_cover(fmt=fmt),
+}
+FORMATS = {"svg": "image/svg+xml", "png": "image/png"}
+
+def _station_id(airport: Airport):
+    return coalesce(airport.icao_code, airport.ident)
+
+def _render_cache_key(airport: Airport, panel: str, fmt: str):
+    metar = airport.metar
+    if metar is None:
+        return (_station_id(airport), panel, None, None, fmt, RENDERING_CONFIG_HASH)
+    return (_station_id(airport), panel, metar.day, metar.time, fmt, RENDERING_CONFIG_HASH)
+
+def panel_etag(airport: Airport, panel: str, fmt: Literal["svg", "png"]="svg"):
+    """
+    Strong ETag of a panel without rendering it, from the station, panel, observation, format & rendering config. 
+    Same inputs as the render cache key, so equal ETags always mean identical bytes. 
+    """
+    return hashlib.sha1(repr(_render_cache_key(airport, panel, fmt)).encode()).hexdigest()[:20]
+
+def render_panel_cached(airport: Airport, panel: str, fmt: Literal["svg", "png"]="svg"):
+    """Render a panel (see PANEL_RENDERERS) as SVG or PNG, reusing the bytes if this observation was already rendered"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format {fmt}, expected one of {list(FORMATS.keys())}")
+    # Reading the key refreshes the METAR, which invalidates stale entries via the listener below
+    key = _render_cache_key(airport, panel, fmt)
+    with _RENDER_CACHE_LOCK:
+        rendered = _RENDER_CACHE.get(key)
+        if rendered is not None:
+            _RENDER_CACHE.move_to_end(key)
+            return BytesIO(rendered)
+
+    if panel in METAR_PANEL_SIZES and airport.metar is None:
+        rendered = render_no_metar(*METAR_PANEL_SIZES[panel], fmt=fmt).getvalue()
+    else:
+        rendered = PANEL_RENDERERS[panel](airport, fmt).getvalue()
+    with _RENDER_CACHE_LOCK:
+        _RENDER_CACHE[key] = rendered
+        _RENDER_CACHE.move_to_end(key)
+        while len(_RENDER_CACHE) > RENDER_CACHE_MAX_ENTRIES:
+            _RENDER_CACHE.popitem(last=False)
+    return BytesIO(rendered)
+
+def invalidate_render_cache(airport: Airport):
+    """Drop all cached renders for an airport, called whenever it picks up a new METAR"""
+    station = _station_id(airport)
+    with _RENDER_CACHE_LOCK:
+        for key in [k for k in _RENDER_CACHE.keys() if k[0] == station]:
+            del _RENDER_CACHE[key]
+
+add_new_metar_listener(invalidate_render_cache)
+
+_SVG_ID_RE = re.compile(r'(id="|href="#|url\(#)([^")]+)')
+_XML_DECLARATION_RE = re.compile(r"^<\?xml[^>]*\?>\s*")
+
+def _inline_svg(svg: bytes, prefix: str):
+    """SVG markup for inlining into a page, with ids prefixed since cairo reuses glyph & surface ids across files"""
+    svg = _XML_DECLARATION_RE.sub("", svg.decode())
+    return _SVG_ID_RE.sub(lambda m: f"{m.group(1)}{prefix}-{m.group(2)}", svg)
+
+def _inline_png(png: bytes, prefix: str):
+    return f'<img class="svg" id="{prefix}-png" src="data:image/png;base64,{base64.b64encode(png).decode()}"/>'
+
+def render_board(airport: Airport | AirportSnapshot, panels=None, fmt: Literal["svg", "png"]="svg"):
+    """
+    Render panels (default all) from one snapshot of the airport, so they always show the same observation. 
+    Returns the snapshot & inline markup by panel (SVG, or an img of the PNG). 
+    """
+    snapshot = airport.snapshot() if isinstance(airport, Airport) else airport
+    panels = panels or PANEL_RENDERERS.keys()
+    inline = _inline_png if fmt == "png" else _inline_svg
+    return snapshot, {panel: inline(render_panel_cached(snapshot, panel, fmt).getvalue(), panel) for panel in panels}
@@ -0,0 +1,148 @@
+"""
+NumPy version of the RunwayWindInfo / Airport._compute_rw_wind computations, for evaluating many observations 
+(ex. years of history) against all of an airport's runways at once. Semantics match RunwayWindInfo, including 
+VRB winds & the gust / variation combinations.
+"""
+
+import numpy as np
+
+# Favored runway end codes
+END_LE = 0
+END_HE = 1
+END_CALM = 2
+
+# Candidate winds in the same relative order as RunwayWindInfo builds them, as (direction source, strength source)
+# so the first maximum headwind picks the same candidate as RunwayWindInfo's stable sort
+_CANDIDATES = [
+    ("direction", "speed"),
+    ("min_variation", "speed"),
+    ("max_variation", "speed"),
+    ("direction", "gust"),
+    ("min_variation", "gust"),
+    ("max_variation", "gust"),
+]
+
+def _as_float_array(a, n):
+    if a is None:
+        return np.full(n, np.nan)
+    return np.asarray(a, dtype=float)
+
+def wind_arrays(winds: list):
+    """Convert Wind objects to the arrays used by compute_runway_winds, VRB direction & missing values become NaN"""
+    def f(v):
+        return np.nan if v is None or v == "VRB" else v
+    return {
+        "direction": np.array([np.nan if w.direction == "VRB" else f(w.degrees) for w in winds], dtype=float),
+        "speed": np.array([f(w.speed) for w in winds], dtype=float),
+        "gust": np.array([f(w.gust) for w in winds], dtype=float),
+        "min_variation": np.array([f(w.min_variation) for w in winds], dtype=float),
+        "max_variation": np.array([f(w.max_variation) for w in winds], dtype=float),
+    }
+
+def compute_runway_winds(headings_le, headings_he, direction, speed, gust=None, min_variation=None, max_variation=None):
+    """
+    Compute wind components for n observations against r runways. 
+    Headings are the true headings of each runway end, shape (r,). Wind arrays have shape (n,), NaN direction means VRB 
+    & NaN gust / variation means not reported. 
+    Returns a dict of (n, r) arrays: favored_end, min_headwind, max_headwind, min_crosswind, max_crosswind. 
+    Positive values indicate headwind & RIGHT crosswinds.
+    """
+    direction = np.asarray(direction, dtype=float)
+    n = direction.shape[0]
+    sources = {
+        "direction": direction,
+        "speed": _as_float_array(speed, n),
+        "gust": _as_float_array(gust, n),
+        "min_variation": _as_float_array(min_variation, n),
+        "max_variation": _as_float_array(max_variation, n),
+    }
+    # Variation requires both bounds
+    has_variation = ~(np.isnan(sources["min_variation"]) | np.isnan(sources["max_variation"]))
+    has_gust = ~np.isnan(sources["gust"])
+    vrb = np.isnan(direction)
+
+    # Candidate directions & strengths, shape (n, 6), with validity mask
+    cand_dir = np.stack([sources[d] for d, _ in _CANDIDATES], axis=1)
+    cand_strength = np.stack([sources[s] for _, s in _CANDIDATES], axis=1)
+    valid = np.stack([
+        np.ones(n, dtype=bool),
+        has_variation,
+        has_variation,
+        has_gust,
+        has_gust & has_variation,
+        has_gust & has_variation,
+    ], axis=1)
+
+    # Components for each end, shape (n, r, 6, 2)
+    headings = np.stack([np.asarray(headings_le, dtype=float), np.asarray(headings_he, dtype=float)], axis=1)
+    offset = np.radians(headings[None, :, None, :] - cand_dir[:, None, :, None])
+    strength = cand_strength[:, None, :, None]
+    crosswind = strength * np.sin(offset)
+    headwind = strength * np.cos(offset)
+    valid = np.broadcast_to(valid[:, None, :, None], headwind.shape)
+
+    # Favored end is the end of the first candidate with the max headwind, flattened in (candidate, end) order
+    masked_headwind = np.where(valid, headwind, -np.inf)
+    n_rw = headings.shape[0]
+    best = np.argmax(masked_headwind.reshape(n, n_rw, -1), axis=2)
+    favored_end = best % 2
+
+    # Reduce over candidates for the favored end
+    end_mask = valid & (np.arange(2)[None, None, None, :] == favored_end[:, :, None, None])
+    with np.errstate(invalid="ignore"):
+        min_headwind = np.min(np.where(end_mask, headwind, np.inf), axis=(2, 3))
+        max_headwind = np.max(np.where(end_mask, headwind, -np.inf), axis=(2, 3))
+        min_crosswind = np.min(np.where(end_mask, crosswind, np.inf), axis=(2, 3))
+        max_crosswind = np.max(np.where(end_mask, crosswind, -np.inf), axis=(2, 3))
+
+    # VRB winds have no favored end, components are the raw speed / gust
+    speed_arr = sources["speed"][:, None]
+    gust_or_speed = np.where(has_gust, sources["gust"], sources["speed"])[:, None]
+    vrb_rw = np.broadcast_to(vrb[:, None], favored_end.shape)
+    favored_end = np.where(vrb_rw, END_CALM, favored_end)
+    min_headwind = np.where(vrb_rw, speed_arr, min_headwind)
+    min_crosswind = np.where(vrb_rw, speed_arr, min_crosswind)
+    max_headwind = np.where(vrb_rw, gust_or_speed, max_headwind)
+    max_crosswind = np.where(vrb_rw, gust_or_speed, max_crosswind)
+
+    return {
+        "favored_end": favored_end,
+        "min_headwind": min_headwind,
+        "max_headwind": max_headwind,
+        "min_crosswind": min_crosswind,
+        "max_crosswind": max_crosswind,
+    }
+
+def compute_airport_winds(airport, direction, speed, gust=None, min_variation=None, max_variation=None):
+    """
+    Vectorized Airport._compute_rw_wind over the airport's unique runways. 
+    Returns a dict of (n,) arrays for the preferred runway: runway_index (into airport.unique_runways, -1 if there 
+    are no runways), favored_end, preferred_end (le for calm), min/max_headwind, min/max_crosswind, 
+    plus "per_runway" with the (n, r) arrays from compute_runway_winds.
+    """
+    runways = airport.unique_runways
+    n = np.asarray(direction).shape[0]
+    if not runways:
+        nan = np.full(n, np.nan)
+        return {
+            "runway_index": np.full(n, -1),
+            "favored_end": np.full(n, END_CALM),
+            "preferred_end": np.full(n, END_LE),
+            "min_headwind": nan, "max_headwind": nan.copy(), 
+            "min_crosswind": nan.copy(), "max_crosswind": nan.copy(),
+            "per_runway": None,
+        }
+
+    per_runway = compute_runway_winds(
+        [rw.le_heading_degT for rw in runways], [rw.he_heading_degT for rw in runways], 
+        direction, speed, gust=gust, min_variation=min_variation, max_variation=max_variation
+    )
+
+    # Runways are sorted by max headwind, the (stable) first one is preferred
+    runway_index = np.argmax(per_runway["max_headwind"], axis=1)
+    rows = np.arange(n)
+    result = {k: v[rows, runway_index] for k, v in per_runway.items()}
+    result["runway_index"] = runway_index
+    result["preferred_end"] = np.where(result["favored_end"] == END_CALM, END_LE, result["favored_end"])
+    result["per_runway"] = per_runway
+    return result
@@ -0,0 +1,103 @@
+"""
+Spatial index over the airport store for nearest station & radius queries. 
+Airports are bucketed into a lat / lon grid, so a query only computes distances for airports in nearby cells.
+"""
+
+import threading
+from math import cos, floor, radians
+
+import numpy as np
+
+import airport_store
+
+EARTH_RADIUS_NM = 3440.065
+NM_PER_DEG_LAT = 60.0
+MAX_DISTANCE_NM = np.pi * EARTH_RADIUS_NM
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    """Great circle distance in nm, vectorized over numpy arrays"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_NM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+class SpatialIndex:
+    def __init__(self, records: list, cell_deg: float=1.0):
+        """records are dicts with at least ident, lat, long & reports_metar"""
+        self.records = records
+        self.cell_deg = cell_deg
+        self.n_lon_cells = int(round(360 / cell_deg))
+        self.lat = np.array([r["lat"] for r in records], dtype=float)
+        self.lon = np.array([r["long"] for r in records], dtype=float)
+        self.reports_metar = np.array([bool(r["reports_metar"]) for r in records], dtype=bool)
+
+        # Sort airports by cell so each cell is a contiguous slice of self._order
+        lat_cells = np.floor(self.lat / cell_deg).astype(int)
+        lon_cells = np.floor(self.lon / cell_deg).astype(int) % self.n_lon_cells
+        keys = lat_cells * self.n_lon_cells + lon_cells
+        self._order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[self._order]
+        unique_keys, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+        self._cells = {int(k): (int(s), int(s + c)) for k, s, c in zip(unique_keys, starts, counts)}
+
+    def __len__(self):
+        return len(self.records)
+
+    def _candidates(self, lat: float, lon: float, nm: float):
+        """Indices of airports in grid cells that could be within nm of the point"""
+        c = self.cell_deg
+        dlat = nm / NM_PER_DEG_LAT
+        lat_lo, lat_hi = max(lat - dlat, -90), min(lat + dlat, 90)
+        # Longitude degrees shrink towards the poles, use the widest span over the latitude range
+        min_cos = min(cos(radians(lat_lo)), cos(radians(lat_hi))) if lat_lo > -90 and lat_hi < 90 else 0
+        dlon = 180 if min_cos <= 1e-6 else min(dlat / min_cos, 180)
+
+        lon_cells = range(floor((lon - dlon) / c), floor((lon + dlon) / c) + 1)
+        if len(lon_cells) >= self.n_lon_cells:
+            lon_cells = range(self.n_lon_cells)
+        lon_cells = {lc % self.n_lon_cells for lc in lon_cells}
+
+        slices = []
+        for lat_cell in range(floor(lat_lo / c), floor(lat_hi / c) + 1):
+            for lon_cell in lon_cells:
+                s = self._cells.get(lat_cell * self.n_lon_cells + lon_cell)
+                if s is not None:
+                    slices.append(self._order[s[0]:s[1]])
+        return np.concatenate(slices) if slices else np.empty(0, dtype=int)
+
+    def _query(self, lat: float, lon: float, nm: float, metar_only: bool):
+        idx = self._candidates(lat, lon, nm)
+        if metar_only:
+            idx = idx[self.reports_metar[idx]]
+        d = haversine_nm(lat, lon, self.lat[idx], self.lon[idx])
+        within = d <= nm
+        idx, d = idx[within], d[within]
+        order = np.argsort(d, kind="stable")
+        return idx[order], d[order]
+
+    def _results(self, idx, d):
+        return [dict(self.records[i], distance_nm=float(dist)) for i, dist in zip(idx, d)]
+
+    def within_radius(self, lat: float, lon: float, nm: float, metar_only: bool=False):
+        """Airports within nm of the point, nearest first, each with a distance_nm"""
+        return self._results(*self._query(lat, lon, nm, metar_only))
+
+    def nearest(self, lat: float, lon: float, k: int, metar_only: bool=False):
+        """The k nearest airports to the point, nearest first, each with a distance_nm"""
+        # Grow the search radius until it holds k airports, everything within the radius is exact
+        nm = 30.0
+        while True:
+            idx, d = self._query(lat, lon, nm, metar_only)
+            if len(idx) >= k or nm >= MAX_DISTANCE_NM:
+                return self._results(idx[:k], d[:k])
+            nm = min(nm * 4, MAX_DISTANCE_NM)
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_spatial_index(rebuild: bool=False):
+    """Lazily build the index over the airport store"""
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None or rebuild:
+            _INDEX = SpatialIndex(airport_store.spatial_records())
+        return _INDEX
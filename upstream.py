@@ -0,0 +1,131 @@
+"""
+Shared HTTP client for all upstream calls (aviationweather, airportdb, IEM). 
+Connections are pooled & kept alive between refreshes, with per-host timeouts & bounded retries with jittered backoff.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import httpx
+from config import config
+
+CONFIG = config["upstream"]
+
+# Status codes worth retrying, anything else >= 400 fails immediately
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class UpstreamError(Exception):
+    """Upstream request failed, either with an error status code or a transport error (status_code is None)"""
+    def __init__(self, url: str, status_code: int=None, message: str=""):
+        self.url = url
+        self.status_code = status_code
+        super().__init__(f"Request to {url} failed" + (f" with status code {status_code}" if status_code is not None else "") + (f": {message}" if message else ""))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Lazily create the shared pooled client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                limits=httpx.Limits(max_connections=CONFIG["pool_max_connections"],
+                                    max_keepalive_connections=CONFIG["pool_max_keepalive_connections"],
+                                    keepalive_expiry=CONFIG["keepalive_expiry_s"]),
+                follow_redirects=True
+            )
+        return _client
+
+def get_timeout(url: str):
+    host = urlparse(url).hostname
+    read_timeout = CONFIG["host_timeouts_s"].get(host, CONFIG["default_timeout_s"])
+    return httpx.Timeout(read_timeout, connect=CONFIG["connect_timeout_s"])
+
+def _backoff_s(attempt: int):
+    """Full jitter exponential backoff"""
+    return random.uniform(0, min(CONFIG["backoff_max_s"], CONFIG["backoff_base_s"] * (2 ** attempt)))
+
+def _check_response(url: str, response: httpx.Response):
+    """Returns (response, error, retryable), where response is None if the status code is an error"""
+    if response.status_code < 400:
+        return response, None, False
+    return None, UpstreamError(url, response.status_code), response.status_code in RETRY_STATUS_CODES
+
+def _retrying(url: str, send, max_retries: int=None):
+    """Call send() until it returns a successful response, retrying transport errors & retryable status codes"""
+    max_retries = CONFIG["max_retries"] if max_retries is None else max_retries
+    for attempt in range(max_retries + 1):
+        try:
+            response, error, retryable = _check_response(url, send())
+        except httpx.TransportError as e:
+            response, error, retryable = None, UpstreamError(url, message=str(e)), True
+        if response is not None:
+            return response
+        if not retryable:
+            break
+        if attempt < max_retries:
+            time.sleep(_backoff_s(attempt))
+    raise error
+
+async def _retrying_async(url: str, send, max_retries: int=None):
+    """Async equivalent of _retrying, send is a coroutine function"""
+    max_retries = CONFIG["max_retries"] if max_retries is None else max_retries
+    for attempt in range(max_retries + 1):
+        try:
+            response, error, retryable = _check_response(url, await send())
+        except httpx.TransportError as e:
+            response, error, retryable = None, UpstreamError(url, message=str(e)), True
+        if response is not None:
+            return response
+        if not retryable:
+            break
+        if attempt < max_retries:
+            await asyncio.sleep(_backoff_s(attempt))
+    raise error
+
+def request(method: str, url: str, params: dict=None, timeout: float=None, max_retries: int=None, **kwargs):
+    """Make a request through the shared client, raising UpstreamError if it ultimately fails"""
+    client = get_client()
+    timeout = get_timeout(url) if timeout is None else timeout
+    return _retrying(url, lambda: client.request(method, url, params=params, timeout=timeout, **kwargs), max_retries=max_retries)
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+@contextmanager
+def stream(url: str, params: dict=None, timeout: float=None):
+    """Stream a GET response body, yields the open response. Retries only cover establishing the response."""
+    client = get_client()
+    timeout = get_timeout(url) if timeout is None else timeout
+    def send():
+        response = client.send(client.build_request("GET", url, params=params, timeout=timeout), stream=True)
+        if response.status_code >= 400:
+            response.close()
+        return response
+    response = _retrying(url, send)
+    try:
+        yield response
+    finally:
+        response.close()
+
+def new_async_client():
+    """
+    Create a pooled async client, to be used as an async context manager. 
+    Async clients are bound to their event loop, so these are not shared like the sync client.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=CONFIG["pool_max_connections"],
+                            max_keepalive_connections=CONFIG["pool_max_keepalive_connections"],
+                            keepalive_expiry=CONFIG["keepalive_expiry_s"]),
+        follow_redirects=True
+    )
+
+async def get_async(client: httpx.AsyncClient, url: str, params: dict=None, timeout: float=None, max_retries: int=None, **kwargs):
+    """Async GET through an async client from new_async_client, raising UpstreamError if it ultimately fails"""
+    timeout = get_timeout(url) if timeout is None else timeout
+    return await _retrying_async(url, lambda: client.get(url, params=params, timeout=timeout, **kwargs), max_retries=max_retries)
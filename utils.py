@@ -1,4 +1,5 @@
 """Unit conversion & other utils"""
+import time
 
 def coalesce_int(s, default=0):
     try:
@@ -22,4 +23,25 @@ def coalesce(*args):
             return o
         
 def mb_to_inHg(mb):
-    return mb / 33.864
\ No newline at end of file
+    return mb / 33.864
+
+class StageTimer:
+    """Records named checkpoints relative to creation, ex. for the startup timing report"""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = []
+
+    def mark(self, name):
+        """Record a checkpoint once, later marks with the same name are ignored"""
+        if name not in (n for n, _ in self.stages):
+            self.stages.append((name, time.perf_counter() - self.start))
+
+    def report(self):
+        lines, prev = [], 0
+        for name, t in self.stages:
+            lines.append(f"{name:<24} +{(t - prev) * 1000:8.1f}ms  {t * 1000:8.1f}ms")
+            prev = t
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {name: round(t * 1000, 1) for name, t in self.stages}